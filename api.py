@@ -0,0 +1,106 @@
+import json
+import time
+import asyncio
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from openai_client import OpenAIClient
+from fiancial_statement import metrics
+from fiancial_statement.pipeline import build_ttm, calculate_scores, latest_period
+
+# 執行方式：uvicorn api:app --workers 4
+
+# 最新期別與分析結果在記憶體中保留的秒數
+LATEST_PERIOD_TTL = 10 * 60
+RESULT_TTL = 6 * 60 * 60
+# 批次查詢最多同時分析的股票數
+BATCH_CONCURRENCY = 8
+
+app = FastAPI(title="AI 財務顧問 API")
+metrics.configure()
+
+
+class TTLCache:
+
+    # 簡易的記憶體快取，同一個鍵同時有多個請求時只會計算一次
+    def __init__(self, ttl, max_entries=4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self.locks = {}
+
+    async def get(self, key, compute):
+        entry = self.entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                entry = self.entries.get(key)
+                if entry and entry[0] > time.monotonic():
+                    return entry[1]
+                value = await compute()
+                if len(self.entries) >= self.max_entries:
+                    self.entries.pop(next(iter(self.entries)))
+                self.entries[key] = (time.monotonic() + self.ttl, value)
+                return value
+        finally:
+            self.locks.pop(key, None)
+
+
+class BatchRequest(BaseModel):
+    stock_codes: list[str]
+
+
+latest_periods = TTLCache(LATEST_PERIOD_TTL)
+results = TTLCache(RESULT_TTL)
+openai_client = None
+
+
+def analyze(stock_code):
+    ttm, year, season = build_ttm(stock_code)
+    return {"stock_code": stock_code, "year": year, "season": season, "scores": calculate_scores(ttm, year, season)}
+
+
+async def score(stock_code):
+    # 以 (股票代號, 最新期別) 為鍵快取結果，抓取與計算在執行緒中進行，不阻塞事件迴圈
+    period = await latest_periods.get(stock_code, lambda: asyncio.to_thread(latest_period, stock_code))
+    return await results.get((stock_code, *period), lambda: asyncio.to_thread(analyze, stock_code))
+
+
+@app.get("/score/{stock_code}")
+async def get_score(stock_code: str):
+    try:
+        return await score(stock_code)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"{type(e).__name__}: {e}")
+
+
+@app.post("/score/batch")
+async def get_scores(request: BatchRequest):
+    # 個別股票失敗時只在該筆結果中回報錯誤
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def score_one(stock_code):
+        async with semaphore:
+            try:
+                return await score(stock_code)
+            except Exception as e:
+                return {"stock_code": stock_code, "error": f"{type(e).__name__}: {e}"}
+
+    return await asyncio.gather(*(score_one(stock_code) for stock_code in dict.fromkeys(request.stock_codes)))
+
+
+@app.get("/report/{stock_code}")
+async def get_report(stock_code: str):
+    # 以串流方式回傳 AI 分析報告
+    global openai_client
+    try:
+        result = await score(stock_code)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"{type(e).__name__}: {e}")
+    openai_client = openai_client or OpenAIClient()
+    data = json.dumps(result["scores"], ensure_ascii=False, indent=2)
+    return StreamingResponse(openai_client.stream_response(data, "分析這家公司"), media_type="text/plain; charset=utf-8")
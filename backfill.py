@@ -0,0 +1,59 @@
+import argparse
+
+from fiancial_statement import metrics
+from fiancial_statement.backfill import Backfill
+from fiancial_statement.market_cap import SnapshotMarketCapProvider
+from fiancial_statement.screener import Screener
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回補歷史財報，計算每一季的 Z-score、F-score、M-score 時間序列")
+    parser.add_argument("source", help="股票代號清單檔（每行一個），或 TWSE、TPEx、ALL")
+    parser.add_argument("--start", type=int, required=True, help="起始年度（民國年）")
+    parser.add_argument("--end", type=int, help="結束年度（民國年），預設為最新一期")
+    parser.add_argument("-o", "--output", default="backfill_scores.parquet", help="輸出檔案（.parquet 或 .csv）")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="同時處理的股票數量")
+    parser.add_argument("--market-cap-dir", help="歷史市值快照（market_cap_YYYYMMDD.csv）所在的目錄")
+    parser.add_argument("--skip-shares", action="store_true", help="不查詢各年度股數（F-score 將為 NaN）")
+    parser.add_argument("--metrics", help="量測輸出：log、prometheus:/path/metrics.prom，預設讀取 FINANCIAL_STATEMENT_METRICS")
+    args = parser.parse_args()
+    sink = metrics.configure(args.metrics)
+
+    # 預設的快照目錄只有開始收集之後的每日快照，回補期間早於最舊的快照時 Z-score 會全部是 NaN
+    market_cap_provider = SnapshotMarketCapProvider(args.market_cap_dir)
+    snapshot_dates = market_cap_provider.snapshot_dates()
+    if args.market_cap_dir is None and (not snapshot_dates or Backfill.available_on(args.start, 1) < snapshot_dates[0]):
+        found = f"最舊的快照為 {snapshot_dates[0]}" if snapshot_dates else "沒有任何快照"
+        parser.error(f"預設市值快照目錄中{found}，回補期間沒有當時的市值；請以 --market-cap-dir 指定歷史快照，或調整 --start")
+
+    stock_codes = Screener.load_stock_codes(args.source)
+    backfill = Backfill(
+        args.start, args.end, max_workers=args.workers,
+        market_cap_provider=market_cap_provider,
+        no_new_shares=not args.skip_shares
+    )
+    progress = {"done": 0}
+
+    def on_result(stock_code, rows, error):
+        progress["done"] += 1
+        status = "失敗 " + error.strip().splitlines()[-1] if error else f"{rows} 期"
+        print(f"[歷史回補] {progress['done']}/{len(stock_codes)} {stock_code} {status}")
+
+    scores, errors = backfill.run(stock_codes, on_result)
+    Backfill.write_results(scores, args.output)
+    if backfill.missing_reports:
+        count = sum(len(requests) for requests in backfill.missing_reports.values())
+        print(f"[歷史回補] {len(backfill.missing_reports)} 檔共 {count} 份報表查無資料（例如上市前的期別），已略過")
+    if backfill.missing_market_caps:
+        periods = backfill.missing_market_caps
+        print(
+            f"[歷史回補] 警告：{len(periods)} 季（{periods[0][0]}Q{periods[0][1]} ~ {periods[-1][0]}Q{periods[-1][1]}）"
+            f"找不到 {Backfill.MAX_SNAPSHOT_AGE.days} 天內的市值快照，這些期別的 Z-score 為 NaN"
+        )
+    print(f"[歷史回補] 共 {len(stock_codes)} 檔、{len(scores)} 筆分數，失敗 {len(errors)} 檔，結果已寫入 {args.output}")
+    if hasattr(sink, "flush"):
+        sink.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 冷啟動的載入時間預算：在新的直譯器中以 python -X importtime 載入核心模組，
+# 超過預算或載入了不該在啟動時載入的重量級套件時以非零狀態結束，可放進 CI
+# 執行方式：python benchmarks/bench_import.py [--budget-ms 400] [--repeat 5]
+
+MODULES = (
+    "fiancial_statement.analyzer",
+    "fiancial_statement.calculator",
+    "fiancial_statement.fetcher",
+    "fiancial_statement.parser",
+    "fiancial_statement.pipeline",
+    "fiancial_statement.screener",
+    "fiancial_statement.shares",
+    "fiancial_statement.incremental",
+    "fiancial_statement.warehouse",
+    "fiancial_statement.metrics",
+    "openai_client"
+)
+
+# 只有特定流程才需要的套件，不應在載入上述模組時出現
+FORBIDDEN = ("streamlit", "openai", "bs4", "yfinance", "pandas")
+
+BUDGET_MS = 400
+
+
+def import_profile(modules):
+    # 回傳 ({模組: 累計微秒}, 頂層載入的總微秒)，只計算 import 陳述式本身，不含直譯器啟動
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    roots = {module.split(".")[0] for module in modules}
+    cumulative = {}
+    total = 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # 格式為「import time: 自身 | 累計 | 模組」，模組名稱的縮排代表被哪一層載入
+        _, cumulative_time, name = line.split("|")
+        name = name[1:].rstrip()
+        cumulative[name.strip()] = int(cumulative_time)
+        # 沒有縮排的是頂層的 import，其累計時間已包含所有相依模組；site 等直譯器啟動時的載入不列入
+        if not name.startswith(" ") and name.split(".")[0] in roots:
+            total += int(cumulative_time)
+    return cumulative, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="核心套件冷啟動的載入時間預算檢查")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS, help="載入時間預算（毫秒）")
+    parser.add_argument("--repeat", type=int, default=5, help="重複次數，取最快的一次以排除雜訊")
+    parser.add_argument("--top", type=int, default=10, help="列出累計時間最長的模組數量")
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.repeat):
+        cumulative, total = import_profile(MODULES)
+        if best is None or total < best[1]:
+            best = (cumulative, total)
+    cumulative, total = best
+
+    for module, microseconds in sorted(cumulative.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{module:<48}{microseconds / 1000:>10.2f}ms")
+
+    failed = False
+    loaded = sorted(package for package in FORBIDDEN if package in cumulative)
+    if loaded:
+        print(f"[載入預算] 啟動時不應載入：{', '.join(loaded)}")
+        failed = True
+    if total / 1000 > args.budget_ms:
+        print(f"[載入預算] 超過預算：{total / 1000:.2f}ms > {args.budget_ms:.0f}ms")
+        failed = True
+    if not failed:
+        print(f"[載入預算] 通過：{total / 1000:.2f}ms <= {args.budget_ms:.0f}ms")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import load_statements
+from fiancial_statement.analyzer import Analyzer
+from fiancial_statement.parser import Parser
+
+
+def legacy_parse(dates, datas, type):
+    # 改版前的逐格解析方式：每一格都重新解析日期、去空白並轉換數值
+    result = {}
+    step = 1 if type == "CF" else 2
+    for data in datas:
+        item_name = re.sub(r'\s+', '', data[0])
+        for i, date in enumerate(dates):
+            year, season = Parser.parse_date.__wrapped__(date)
+            amount = data[i * step + 1].replace(' ', '').replace(',', '')
+            if amount != "":
+                result.setdefault(year, {}).setdefault(season, {})[item_name] = float(amount)
+    return result
+
+
+def measure(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(repeat=5):
+    statements = [(type, Parser.extract_dates(result), result["reportList"]) for type, result in load_statements()]
+    rows = sum(len(datas) for _, _, datas in statements)
+
+    def run_legacy():
+        return [legacy_parse(dates, datas, type) for type, dates, datas in statements]
+
+    def run_current():
+        analyzer = Analyzer("0000", cache=False)
+        for type, dates, datas in statements:
+            analyzer.parse_financial_statement(type, dates, datas, None)
+        return analyzer
+
+    # 確認兩種解析方式的結果相同
+    expected = {}
+    for parsed in run_legacy():
+        for year, seasons in parsed.items():
+            for season, items in seasons.items():
+                expected.setdefault(year, {}).setdefault(season, {}).update(items)
+    assert run_current().result.to_dict() == expected
+
+    before = measure(run_legacy, repeat)
+    after = measure(run_current, repeat)
+    print(f"報表 {len(statements)} 份，共 {rows} 列")
+    print(f"改版前: {rows / before:,.0f} rows/sec")
+    print(f"改版後: {rows / after:,.0f} rows/sec（{before / after:.1f}x）")
+
+
+if __name__ == "__main__":
+    main()
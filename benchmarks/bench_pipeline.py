@@ -0,0 +1,187 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import ReplayHttpClient, StaticMarketCapProvider
+from benchmarks.llm_stub import start_stub
+from fiancial_statement.analyzer import Analyzer
+from fiancial_statement.calculator import Calculator
+from fiancial_statement.columnar_calculator import ColumnarCalculator
+from fiancial_statement.shares import ShareCapitalSource
+from openai_client import OpenAIClient
+
+# 離線重現的效能測試：MOPS 以錄製（或合成）的回應重播，市值與 LLM 使用假的來源
+# 執行方式：python benchmarks/bench_pipeline.py [--universe 2000] [--compare 舊結果.json]
+
+TYPES = ("BS", "CI", "CF")
+YEARS = 3
+
+
+class Timer:
+
+    def __init__(self):
+        self.stages = defaultdict(float)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        self.stages[name] += time.perf_counter() - start
+
+
+def fetch_reports(analyzer):
+    # 與 Analyzer.retrieve_all 相同：先抓最新一期，再抓去除重複後的其餘報表，回傳 [(type, response), ...]
+    latest = analyzer.fetcher.fetch_many([(type, "LASTEST", "LASTEST") for type in TYPES])
+    year, season = latest[-1][0], latest[-1][1]
+    sequence = []
+    for offset in range(YEARS):
+        for type in TYPES:
+            sequence += analyzer.plan_trailing_twelve_months(type, year - offset, season)
+    fetched = [(type, response[0], response[1]) for type, response in zip(TYPES, latest)]
+    pending = [request for request in dict.fromkeys(sequence) if request not in fetched]
+    reports = list(zip(TYPES, latest)) + [(request[0], response) for request, response in zip(pending, analyzer.fetcher.fetch_many(pending))]
+    return reports, year, season
+
+
+def run_ticker(stock_code, http, share_source, market_cap_provider, timer, prefix):
+    # 依序執行每個階段並分別計時，回傳 TTM
+    analyzer = Analyzer(stock_code, cache=False, http=http)
+    with timer.stage(f"{prefix}.fetch"):
+        reports, year, season = fetch_reports(analyzer)
+    for type, (_, _, dates, datas) in reports:
+        with timer.stage(f"{prefix}.parse.{type}"):
+            analyzer.parse_financial_statement(type, dates, datas, season)
+    ttm = {"stock_code": stock_code}
+    with timer.stage(f"{prefix}.calculate_ttm"):
+        for offset in range(YEARS):
+            ttm[year - offset] = analyzer.calculate_ttm(year - offset, season)
+    calculator = Calculator(ttm, year, season, share_source, market_cap_provider)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in ("z_score", "f_score", "m_score"):
+            with timer.stage(f"{prefix}.{name}"):
+                getattr(calculator, f"calculate_{name}")()
+    return ttm, year, season
+
+
+def bench_single(repeat, directory, llm_delay):
+    # 單一股票：每個階段取多次執行中最快的一次（股數快取在第一次後已暖機）
+    http = ReplayHttpClient()
+    share_source = ShareCapitalSource(os.path.join(directory, "shares.sqlite3"), cache=False, http=http)
+    market_cap_provider = StaticMarketCapProvider()
+    best = {}
+    for _ in range(repeat):
+        timer = Timer()
+        ttm, year, season = run_ticker("2330", http, share_source, market_cap_provider, timer, "single")
+        for name, seconds in timer.stages.items():
+            best[name] = min(best.get(name, seconds), seconds)
+
+    server, base_url = start_stub(llm_delay)
+    try:
+        os.environ.setdefault("API_KEY", "benchmark")
+        client = OpenAIClient(base_url=base_url, cache=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            scores = {"z_score": Calculator(ttm, year, season, share_source, market_cap_provider).calculate_z_score()}
+        data = json.dumps(scores, ensure_ascii=False)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            client.get_response(data, "分析這家公司")
+            best["single.llm"] = min(best.get("single.llm", float("inf")), time.perf_counter() - start)
+            start = time.perf_counter()
+            stream = client.stream_response(data, "分析這家公司")
+            next(stream)
+            best["single.llm_first_token"] = min(best.get("single.llm_first_token", float("inf")), time.perf_counter() - start)
+            list(stream)
+    finally:
+        server.shutdown()
+    return best
+
+
+def bench_universe(size, rows, directory):
+    # 合成的整個市場：逐檔累計各階段時間，最後以 ColumnarCalculator 一次計算全部分數
+    http = ReplayHttpClient(rows=rows)
+    share_source = ShareCapitalSource(os.path.join(directory, "universe_shares.sqlite3"), cache=False, http=http)
+    market_cap_provider = StaticMarketCapProvider()
+    # 先以未計時的方式產生各組合成資料
+    for index in range(http.variants):
+        fetch_reports(Analyzer(str(1000 + index), cache=False, http=http))
+    timer = Timer()
+    ttms = []
+    for index in range(size):
+        stock_code = str(1000 + index)
+        ttms.append(run_ticker(stock_code, http, share_source, market_cap_provider, timer, "universe")[0])
+    stock_codes = [ttm["stock_code"] for ttm in ttms]
+    market_caps = {stock_code: market_cap_provider.get(stock_code) for stock_code in stock_codes}
+    no_new_shares = {stock_code: share_source.is_no_new_shares(stock_code) for stock_code in stock_codes}
+    with timer.stage("universe.columnar_frame"):
+        calculator = ColumnarCalculator.from_ttm(ttms, market_caps, no_new_shares)
+    with timer.stage("universe.columnar_scores"):
+        calculator.calculate_scores()
+    return dict(timer.stages)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, previous):
+    print(f"{'stage':<32}{'before':>12}{'after':>12}{'ratio':>8}")
+    for name, seconds in sorted(current["stages"].items()):
+        before = previous["stages"].get(name)
+        ratio = f"{seconds / before:.2f}x" if before else "-"
+        before = f"{before * 1000:.2f}ms" if before else "-"
+        print(f"{name:<32}{before:>12}{seconds * 1000:>10.2f}ms{ratio:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="離線的各階段效能測試，結果輸出為 JSON")
+    parser.add_argument("--repeat", type=int, default=5, help="單一股票測試的重複次數")
+    parser.add_argument("--universe", type=int, default=2000, help="合成市場的股票數量，0 代表略過")
+    parser.add_argument("--rows", type=int, default=120, help="合成市場每份報表的列數")
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="模擬 LLM 的回應延遲（秒）")
+    parser.add_argument("--output", help="結果 JSON 的路徑，預設為 benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="與先前的結果 JSON 比較")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        stages = bench_single(args.repeat, directory, args.llm_delay)
+        if args.universe:
+            stages.update(bench_universe(args.universe, args.rows, directory))
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "universe": args.universe,
+        "stages": stages
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(result, file, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(result, json.load(file))
+    else:
+        for name, seconds in sorted(stages.items()):
+            print(f"{name:<32}{seconds * 1000:>10.2f}ms")
+    print(f"結果已寫入 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import os
+import json
+import glob
+import random
+import threading
+
+from urllib.parse import urlparse
+
+from fiancial_statement.fetcher import Fetcher
+from fiancial_statement.http_client import HttpClient
+from fiancial_statement.market_cap import MarketCapProvider
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SEASON_END = {1: "03月31日", 2: "06月30日", 3: "09月30日", 4: "12月31日"}
+LATEST_PERIOD = (113, 2)
+
+# Calculator 需要的會計項目，合成報表一定包含這些項目且數值為正
+REQUIRED_ITEMS = {
+    "BS": ["資產總額", "流動資產合計", "流動負債合計", "保留盈餘合計", "負債總額", "非流動負債合計", "應收帳款淨額", "非流動資產合計", "不動產、廠房及設備"],
+    "CI": ["本期稅前淨利（淨損）", "利息收入", "營業收入合計", "本期淨利（淨損）", "營業成本合計", "營業毛利（毛損）", "推銷費用", "管理費用"],
+    "CF": ["折舊費用", "攤銷費用", "營業活動之淨現金流入（流出）"]
+}
+TYPES = {urlparse(url).path.rsplit("/", 1)[-1]: type for type, url in Fetcher.BASE_URLS.items()}
+
+
+def synthetic_statement(type, year, season, rows=400, seed=0):
+    # 產生與 MOPS t164sb03/04/05 回應（response.json()['result']）相同結構的報表
+    generator = random.Random(f"{type}-{year}-{season}-{seed}")
+    if type == "BS":
+        titles = [f"{year}年{SEASON_END[season]}", f"{year - 1}年12月31日", f"{year - 1}年{SEASON_END[season]}"]
+    elif season == 4:
+        titles = [f"{year}年度", f"{year - 1}年度"]
+    else:
+        titles = [f"{year}年第{season}季", f"{year - 1}年第{season}季", f"{year}年前{season}季", f"{year - 1}年前{season}季"]
+    required = REQUIRED_ITEMS[type]
+    report = []
+    for index in range(max(rows, len(required))):
+        row = [f"  {required[index]}" if index < len(required) else f"  {type}項目 {index}  "]
+        for _ in titles:
+            if index < len(required):
+                row.append(f"{generator.randint(10 ** 5, 10 ** 9):,}")
+            else:
+                row.append("" if generator.random() < 0.05 else f"{generator.randint(-10 ** 9, 10 ** 9):,}")
+            if type != "CF":
+                row.append(f"{generator.uniform(0, 100):.2f}")
+        report.append(row)
+    return {
+        "year": str(year),
+        "season": str(season),
+        "titles": [{"main": "會計項目"}] + [{"main": title} for title in titles],
+        "reportList": report
+    }
+
+
+def synthetic_share_page(stock_code, year):
+    # 產生與 ajax_t16sn02 相同關鍵欄位的股權分散表頁面
+    total_shares = random.Random(f"{stock_code}-{year // 2}").randint(10 ** 7, 10 ** 10)
+    return (
+        f'<html><body><form><input type="hidden" name="Q2V" value="{year}"></form>'
+        f'<table><tr><td>實際發行總股數</td><td>股</td><td> {total_shares:,} </td></tr></table></body></html>'
+    )
+
+
+def load_statements():
+    # 優先使用 fixtures 目錄中錄製的 MOPS 回應，沒有時改用合成的報表，回傳 [(type, result), ...]
+    statements = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "t164sb0*.json"))):
+        with open(path, encoding="utf-8") as file:
+            fixture = json.load(file)
+        statements.append((fixture["type"], fixture["result"]))
+    if statements:
+        return statements
+    return [
+        (type, synthetic_statement(type, year, season))
+        for type in ("BS", "CI", "CF") for year in (111, 112, 113) for season in (1, 2, 3, 4)
+    ]
+
+
+def fixture_name(url, data):
+    # 以請求內容決定錄製檔名，例如 t164sb04_2330_113_2.json、ajax_t16sn02_2330_LASTEST.html
+    endpoint = urlparse(url).path.rsplit("/", 1)[-1]
+    if endpoint in TYPES:
+        payload = json.loads(data)
+        period = "LASTEST" if payload["dataType"] == 1 else f"{payload['year']}_{payload['season']}"
+        return f"{endpoint}_{payload['companyId']}_{period}.json"
+    return f"{endpoint}_{data['co_id']}_{data['year']}.html"
+
+
+class FixtureResponse:
+
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ReplayHttpClient:
+
+    # 以錄製的回應取代 HttpClient，找不到錄製檔時改用合成的回應，完全不需要網路
+    # 合成的回應依公司輪流使用 variants 組資料並保留在記憶體，避免把產生資料的時間算進抓取階段
+    def __init__(self, directory=FIXTURE_DIR, rows=400, latest_period=LATEST_PERIOD, variants=20):
+        self.directory = directory
+        self.rows = rows
+        self.latest_period = latest_period
+        self.variants = variants
+        self.seeds = {}
+        self.responses = {}
+        self.lock = threading.Lock()
+
+    def synthesize(self, endpoint, company, year, season):
+        with self.lock:
+            seed = self.seeds.setdefault(company, len(self.seeds) % self.variants)
+        key = (endpoint, seed, year, season)
+        if key not in self.responses:
+            result = synthetic_statement(TYPES[endpoint], year, season, self.rows, seed)
+            self.responses[key] = json.dumps({"result": result}, ensure_ascii=False)
+        return self.responses[key]
+
+    def request(self, method, url, data=None, **kwargs):
+        name = fixture_name(url, data)
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                text = file.read()
+            if name.endswith(".json"):
+                text = json.dumps({"result": json.loads(text)["result"]}, ensure_ascii=False)
+            return FixtureResponse(text)
+        endpoint = urlparse(url).path.rsplit("/", 1)[-1]
+        if endpoint in TYPES:
+            payload = json.loads(data)
+            year, season = self.latest_period if payload["dataType"] == 1 else (int(payload["year"]), int(payload["season"]))
+            return FixtureResponse(self.synthesize(endpoint, payload["companyId"], year, season))
+        year = self.latest_period[0] if data["year"] == "LASTEST" else int(data["year"])
+        return FixtureResponse(synthetic_share_page(data["co_id"], year))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+class RecordingHttpClient(HttpClient):
+
+    # 正常連線，並把 MOPS 的回應存成 ReplayHttpClient 可以讀取的錄製檔
+    def __init__(self, directory=FIXTURE_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def request(self, method, url, **kwargs):
+        response = super().request(method, url, **kwargs)
+        name = fixture_name(url, kwargs.get("data"))
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as file:
+            if name.endswith(".json"):
+                type = TYPES[urlparse(url).path.rsplit("/", 1)[-1]]
+                json.dump({"type": type, "request": json.loads(kwargs["data"]), "result": response.json()["result"]}, file, ensure_ascii=False)
+            else:
+                file.write(response.text)
+        return response
+
+
+class StaticMarketCapProvider(MarketCapProvider):
+
+    # 不需要網路的市值來源，依股票代號產生固定的市值
+    def get(self, stock_code):
+        return float(random.Random(stock_code).randint(10 ** 9, 10 ** 13))
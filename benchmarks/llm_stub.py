@@ -0,0 +1,90 @@
+import json
+import time
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 本機相容 OpenAI chat.completions 的測試伺服器，回傳固定內容，可模擬延遲
+REPORT = ["這家公司", "的財務狀況", "大致穩健。"]
+
+
+class StubServer(ThreadingHTTPServer):
+
+    # 記錄收到的請求數與最大同時處理的請求數
+    def __init__(self, address, handler):
+        super().__init__(address, handler)
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    delay = 0.0
+    # 串流送出幾段後直接斷線（不送 finish_reason 與 [DONE]），模擬中斷的回應；None 為完整送出
+    fail_after = None
+    # 為 True 時以使用者的提示作為回應內容，用來確認回應的順序
+    echo = False
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            time.sleep(self.delay)
+            if request.get("stream"):
+                self.stream(request)
+            else:
+                self.complete(request)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def content(self, request):
+        return request["messages"][-1]["content"] if self.echo else "".join(REPORT)
+
+    def stream(self, request):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        contents = [self.content(request)] if self.echo else REPORT
+        for index, content in enumerate(contents):
+            if index == self.fail_after:
+                return
+            self.send_chunk(request, {"content": content}, None)
+        if self.fail_after is not None and self.fail_after >= len(contents):
+            return
+        self.send_chunk(request, {}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def send_chunk(self, request, delta, finish_reason):
+        chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": request["model"],
+                 "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    def complete(self, request):
+        body = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": request["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.content(request)}, "finish_reason": "stop"}]
+        }, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(delay=0.0, fail_after=None, echo=False):
+    # 在背景執行緒啟動伺服器，回傳 (server, base_url)
+    handler = type("DelayedStubHandler", (StubHandler,), {"delay": delay, "fail_after": fail_after, "echo": echo})
+    server = StubServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
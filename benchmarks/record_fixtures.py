@@ -0,0 +1,32 @@
+import os
+import sys
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import FIXTURE_DIR, RecordingHttpClient
+from fiancial_statement.analyzer import Analyzer
+from fiancial_statement.shares import ShareCapitalSource
+
+# 連線至 MOPS，把分析所需的 t164sb03/04/05 與 ajax_t16sn02 回應錄製到 benchmarks/fixtures
+# 執行方式：python benchmarks/record_fixtures.py 2330
+
+
+def main():
+    parser = argparse.ArgumentParser(description="錄製 MOPS 回應供離線效能測試使用")
+    parser.add_argument("stock_codes", nargs="+", help="要錄製的股票代號")
+    parser.add_argument("--directory", default=FIXTURE_DIR, help="錄製檔輸出目錄")
+    args = parser.parse_args()
+
+    http = RecordingHttpClient(args.directory)
+    with tempfile.TemporaryDirectory() as directory:
+        share_source = ShareCapitalSource(os.path.join(directory, "shares.sqlite3"), cache=False, http=http)
+        for stock_code in args.stock_codes:
+            Analyzer(stock_code, cache=False, http=http).retrieve_all()
+            share_source.is_no_new_shares(stock_code)
+            print(f"[錄製] {stock_code} 完成")
+
+
+if __name__ == "__main__":
+    main()
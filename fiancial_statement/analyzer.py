@@ -1,16 +1,19 @@
-import re
-import streamlit as st
+import numpy as np
 
+from fiancial_statement import metrics
 from fiancial_statement.parser import Parser
 from fiancial_statement.fetcher import Fetcher
+from fiancial_statement.store import StatementStore
 
 
 
 class Analyzer:
 
-    def __init__(self, stock_code):
-      self.fetcher = Fetcher(stock_code)
-      self.result = {}
+    def __init__(self, stock_code, cache=None, http=None, warehouse=None):
+      self.fetcher = Fetcher(stock_code, cache, http)
+      self.result = StatementStore()
+      # 有設定 Warehouse 時，解析後的財報會一併保存
+      self.warehouse = warehouse
 
     def retrieve_trailing_twelve_months(self, type, year="LASTEST", season="LASTEST"):
 
@@ -27,6 +30,67 @@ class Analyzer:
 
       self.year = year
       self.season = season
+      self.save()
+
+    def retrieve_all(self, types=("BS", "CI", "CF"), years=3):
+      # 一次規劃所有需要的報表並同時抓取，結果與依序呼叫 retrieve_trailing_twelve_months 相同
+
+      # 第一輪：同時抓取各報表的最新一期，確定最新的年份與季度
+      responses = {}
+      sequence = []
+      for type, response in zip(types, self.fetcher.fetch_many([(type, "LASTEST", "LASTEST") for type in types])):
+        year, season = response[0], response[1]
+        responses[(type, year, season)] = response
+        sequence += self.plan_trailing_twelve_months(type, year, season)
+
+      # 第二輪：依最新期別規劃往前幾年的報表，去除重複後同時抓取
+      for offset in range(1, years):
+        for type in types:
+          sequence += self.plan_trailing_twelve_months(type, year - offset, season)
+      pending = [request for request in dict.fromkeys(sequence) if request not in responses]
+      responses.update(zip(pending, self.fetcher.fetch_many(pending)))
+
+      # 依照原本逐次呼叫的順序解析，確保重疊期別的覆寫結果一致
+      for request in sequence:
+        type = request[0]
+        _, _, dates, datas = responses[request]
+        self.parse_financial_statement(type, dates, datas, request[2])
+
+      self.year = year
+      self.season = season
+      self.save()
+
+    def plan_trailing_twelve_months(self, type, year, season):
+      # 列出 retrieve_trailing_twelve_months 會抓取的 (type, year, season)
+      plan = [(type, year, season)]
+      if season != 4:
+        plan.append((type, year - 1, season))
+        if type in ["CI", "CF"]:
+          plan.append((type, year - 1, 4))
+      return plan
+
+    def update_incremental(self, incremental, types=("BS", "CI", "CF"), year="LASTEST", season="LASTEST"):
+      # 只抓取指定一期的報表，並把報表中各期的數值交給 IncrementalTTM 更新受影響的 TTM
+      updated = {}
+      responses = self.fetcher.fetch_many([(type, year, season) for type in types])
+      for type, (year, season, dates, datas) in zip(types, responses):
+        self.parse_financial_statement(type, dates, datas, season)
+        items = [Parser.normalize_item_name(data[0]) for data in datas]
+        for period in dict.fromkeys(Parser.parse_date(date) for date in dates):
+          values = {item: self.result.get(*period, item) for item in items}
+          values = {item: amount for item, amount in values.items() if amount is not None}
+          if values:
+            updated.setdefault(type, []).extend(incremental.update(self.fetcher.stock_code, type, *period, values))
+      self.year = year
+      self.season = season
+      self.save()
+      return {type: sorted(set(windows)) for type, windows in updated.items()}
+
+    def save(self):
+      # 解析完成後釋放多預留的列與欄，有設定 Warehouse 時一併保存
+      self.result.compact()
+      if self.warehouse is not None:
+        self.warehouse.write(self.fetcher.stock_code, self.result)
 
     def fetch_and_parse(self, type, year, season):
       # 根據財報類型、年份、季度抓取數據並解析
@@ -34,7 +98,7 @@ class Analyzer:
       self.parse_financial_statement(type, dates, datas, season)
 
     def add_item_to_result(self, year, season, item_name, amount):
-      self.result.setdefault(year, {}).setdefault(season,{})[item_name] = amount
+      self.result.set(year, season, item_name, amount)
 
     def parse_financial_statement(self, type, dates, datas, season):
       # 根據類型解析財報
@@ -46,44 +110,43 @@ class Analyzer:
         self.parse_cash_flow(dates, datas, season)
 
     def parse_balance_sheet(self, dates, datas, season):
-      for data in datas:
-        item_name = re.sub(r'\s+', '', data[0])
-        for i, date in enumerate(dates):
-          year, season = Parser.parse_date(date)
-          amount = data[i * 2 + 1].replace(' ', '').replace(',', '')
-          if amount != "":
-            self.result.setdefault(year, {}).setdefault(season,{})[item_name] = float(amount)
+      # 每個日期對應「金額、%」兩欄
+      with metrics.span("parse", type="BS"):
+        self.parse_report(dates, datas, 2)
 
     def parse_comprehensive_income(self, dates, datas, season):
-      for data in datas:
-        item_name = re.sub(r'\s+', '', data[0])
-        for i, date in enumerate(dates):
-          year, season = Parser.parse_date(date)
-          if season == 4:
-            amount = data[i * 2 + 1].replace(' ', '').replace(',', '')
-          else:
-            amount = data[i * 2 + 1].replace(' ', '').replace(',', '')
-          if amount != "":
-            self.result.setdefault(year, {}).setdefault(season,{})[item_name] = float(amount)
+      # 每個日期對應「金額、%」兩欄
+      with metrics.span("parse", type="CI"):
+        self.parse_report(dates, datas, 2)
 
     def parse_cash_flow(self, dates, datas, season):
-      for data in datas:
-          item_name = re.sub(r'\s+', '', data[0])
-          for i, date in enumerate(dates):
-            year, season = Parser.parse_date(date)
-            amount = data[i + 1].replace(' ', '').replace(',', '')
-            if amount != "":
-              self.result.setdefault(year, {}).setdefault(season,{})[item_name] = float(amount)
-
+      # 每個日期只有金額一欄
+      with metrics.span("parse", type="CF"):
+        self.parse_report(dates, datas, 1)
+
+    def parse_report(self, dates, datas, step):
+      # 每份報表只解析一次各欄位對應的期別，數值整批轉換後逐期寫入
+      if not datas:
+        return
+      periods = [Parser.parse_date(date) for date in dates]
+      item_ids = [self.result.vocabulary.id(Parser.normalize_item_name(data[0])) for data in datas]
+      amounts = Parser.parse_amounts(datas, [i * step + 1 for i in range(len(dates))])
+      for column, (year, season) in enumerate(periods):
+        self.result.set_many(year, season, item_ids, amounts[:, column])
+
+    @metrics.timed("calculate_ttm")
     def calculate_ttm(self, year, season):
       # st.write("[整理數據] 正在計算過去12個月資料(TTM)\n")
-      data = {}
-      for key in list(self.result[year][season]):
-        if season == 4:
-          data[key] = self.result[year][season][key]
-        else:
-          current_value = self.result[year][season].get(key, 0)
-          previous_next_season = self.result.get(year - 1,{}).get(season + 1,{}).get(key, 0)
-          previous_value = self.result.get(year - 1,{}).get(season,{}).get(key, 0)
-          data[key] = current_value + previous_next_season - previous_value
-      return data
\ No newline at end of file
+      if not self.result.has_period(year, season):
+        raise KeyError((year, season))
+      # 項目總數只讀一次，避免其他公司同時登記新項目時各期向量長度不一致
+      size = len(self.result.vocabulary)
+      current_value = self.result.vector(year, season, size=size)
+      if season == 4:
+        values = current_value
+      else:
+        previous_next_season = self.result.vector(year - 1, season + 1, 0, size)
+        previous_value = self.result.vector(year - 1, season, 0, size)
+        values = current_value + previous_next_season - previous_value
+      names = self.result.vocabulary.names[:size]
+      return {names[item_id]: float(values[item_id]) for item_id in np.flatnonzero(~np.isnan(current_value))}
\ No newline at end of file
@@ -0,0 +1,216 @@
+import datetime
+import traceback
+
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from fiancial_statement import metrics
+from fiancial_statement.analyzer import Analyzer
+from fiancial_statement.columnar_calculator import ColumnarCalculator
+from fiancial_statement.market_cap import SnapshotMarketCapProvider
+from fiancial_statement.parser import Parser
+from fiancial_statement.screener import Screener
+from fiancial_statement.shares import ShareCapitalSource
+
+
+class Backfill:
+
+    # 回補多年的歷史財報，計算每家公司每一季以當時可取得的數據算出的 Z-score、F-score、M-score
+    TYPES = ("BS", "CI", "CF")
+
+    # F-score 與 M-score 需要往前兩年的 TTM
+    WARMUP_YEARS = 2
+
+    # 各季財報的法定公告期限（月, 日, 年度位移），視為該期分數可取得的日期
+    DEADLINES = {1: (5, 15, 0), 2: (8, 14, 0), 3: (11, 14, 0), 4: (3, 31, 1)}
+
+    # 市值快照早於公告期限超過此天數時視為沒有當時的市值
+    MAX_SNAPSHOT_AGE = datetime.timedelta(days=31)
+
+    def __init__(self, start_year, end_year=None, max_workers=8, cache=None, http=None, share_source=None, market_cap_provider=None, no_new_shares=True):
+        # start_year、end_year 為民國年，end_year 為 None 時回補到最新一期
+        self.start_year = start_year
+        self.end_year = end_year
+        self.max_workers = max_workers
+        self.cache = cache
+        self.http = http
+        self.share_source = share_source or ShareCapitalSource(cache=cache, http=http)
+        # 以 MarketCapProvider.snapshot 查詢各期公告期限當時的市值，預設不使用共用的實例
+        self.market_cap_provider = market_cap_provider or SnapshotMarketCapProvider()
+        self.no_new_shares = no_new_shares
+        # 找不到當時市值快照的期別，這些期別的 Z-score 為 NaN
+        self.missing_market_caps = []
+        # 各公司查無資料而略過的報表 {stock_code: [(type, year, season), ...]}
+        self.missing_reports = {}
+
+    def periods(self, last_year, last_season):
+        # 回補範圍內（含前置的 WARMUP_YEARS 年）已公布的期別
+        end = (last_year, last_season)
+        if self.end_year is not None:
+            end = min(end, (self.end_year, 4))
+        return [
+            (year, season)
+            for year in range(self.start_year - self.WARMUP_YEARS, end[0] + 1)
+            for season in (1, 2, 3, 4) if (year, season) <= end
+        ]
+
+    def retrieve(self, stock_code):
+        # 先抓最新一期確定可回補到哪一季，再一次抓取範圍內的所有報表
+        # 相鄰期別的 TTM 共用同一份報表，每份 (type, year, season) 只抓一次
+        analyzer = Analyzer(stock_code, self.cache, self.http)
+        latest = analyzer.fetcher.fetch_many([(type, "LASTEST", "LASTEST") for type in self.TYPES])
+        responses = {(type, response[0], response[1]): response for type, response in zip(self.TYPES, latest)}
+        last_period = min(response[:2] for response in latest)
+        pending = [
+            (type, year, season)
+            for year, season in self.periods(*last_period) for type in self.TYPES
+            if (type, year, season) not in responses
+        ]
+        missing = []
+        for request, response in zip(pending, analyzer.fetcher.fetch_many(pending, return_exceptions=True)):
+            # 上市前的期別查無資料，略過並記錄；連線錯誤等其他例外讓整家公司失敗
+            if isinstance(response, KeyError):
+                missing.append(request)
+            elif isinstance(response, Exception):
+                raise response
+            else:
+                responses[request] = response
+        metrics.increment("backfill.missing", len(missing))
+
+        # 由新到舊解析：較早期別在後續報表中的比較數字，會被該期自己的報表覆寫，保留當時公告的數值
+        stock_items = set()
+        for request in sorted(responses, key=lambda request: request[1:], reverse=True):
+            type, _, season = request
+            _, _, dates, datas = responses[request]
+            analyzer.parse_financial_statement(type, dates, datas, season)
+            if type == "BS":
+                stock_items.update(Parser.normalize_item_name(data[0]) for data in datas)
+        analyzer.result.compact()
+        return analyzer.result, stock_items, last_period, missing
+
+    @staticmethod
+    def rolling_ttm(store, stock_items, periods, items=ColumnarCalculator.ITEMS):
+        # 一次算出所有期別的 TTM，回傳 (期別, 項目) 陣列，公式與 IncrementalTTM 相同：
+        # 資產負債表項目取當期快照；損益與現金流量項目為 當期累計 + 去年 Q4 - 去年同期累計，Q4 即為全年
+        item_ids = [store.vocabulary.ids.get(item) for item in items]
+        known = [column for column, item_id in enumerate(item_ids) if item_id is not None]
+        known_ids = [item_ids[column] for column in known]
+        rows = {period: row for row, period in enumerate(sorted(store.periods))}
+        # 最後一列代表沒有數據的期別
+        missing = len(rows)
+        cumulative = np.full((missing + 1, len(items)), np.nan)
+        for period, row in rows.items():
+            cumulative[row, known] = store.vector(*period)[known_ids]
+
+        current = cumulative[[rows.get(period, missing) for period in periods]]
+        previous_q4 = cumulative[[rows.get((year - 1, 4), missing) for year, _ in periods]]
+        previous = cumulative[[rows.get((year - 1, season), missing) for year, season in periods]]
+        derived = current + np.nan_to_num(previous_q4) - np.nan_to_num(previous)
+        derived[[(year - 1, 4) not in rows or (year - 1, season) not in rows for year, season in periods]] = np.nan
+
+        flow = np.array([item not in stock_items for item in items])
+        annual = np.array([season == 4 for _, season in periods])
+        return np.where(flow & ~annual[:, None], derived, current)
+
+    def process(self, stock_code):
+        # 單一公司：抓取、整理出每一季的 TTM，並查詢各年度是否發行新股
+        with metrics.span("backfill.company"):
+            store, stock_items, last_period, missing = self.retrieve(stock_code)
+            periods = [period for period in self.periods(*last_period) if store.has_period(*period)]
+            ttm = self.rolling_ttm(store, stock_items, periods)
+        index = pd.MultiIndex.from_tuples([(stock_code, *period) for period in periods], names=["stock_code", "year", "season"])
+        frame = pd.DataFrame(ttm, index=index, columns=list(ColumnarCalculator.ITEMS))
+
+        no_new_shares = {}
+        if self.no_new_shares:
+            for year in sorted({year for year, _ in periods if year >= self.start_year}):
+                try:
+                    no_new_shares[(stock_code, year)] = float(self.share_source.is_no_new_shares(stock_code, year))
+                except ValueError:
+                    # 查無該年度或前一年度的股數（例如剛上市）時 F-score 為 NaN，連線錯誤則讓整家公司失敗
+                    continue
+        return frame, no_new_shares, missing
+
+    @classmethod
+    def available_on(cls, year, season):
+        # 某一期財報的公告期限（西元日期）
+        month, day, offset = cls.DEADLINES[season]
+        return datetime.date(year + 1911 + offset, month, day)
+
+    def market_caps(self, index):
+        # 依各期的公告期限載入當時的市值快照，回傳 {season: {(stock_code, year): 市值}}
+        result = {}
+        self.missing_market_caps = []
+        stock_codes = index.get_level_values("stock_code").unique()
+        for year, season in sorted(set(zip(index.get_level_values("year"), index.get_level_values("season")))):
+            # 前置年度只用於比較，不需要市值
+            if year < self.start_year:
+                continue
+            date = self.available_on(year, season)
+            snapshot_date, market_caps = self.market_cap_provider.snapshot(date)
+            if snapshot_date is None or date - snapshot_date > self.MAX_SNAPSHOT_AGE:
+                self.missing_market_caps.append((year, season))
+                metrics.increment("backfill.missing_market_caps")
+                continue
+            result.setdefault(season, {}).update(
+                ((stock_code, year), market_caps[stock_code]) for stock_code in stock_codes if stock_code in market_caps
+            )
+        return result
+
+    def scores(self, frames, no_new_shares):
+        # 同一季的各年度 TTM 放在一起交給 ColumnarCalculator，一次算出所有公司、所有年度的分數
+        if not frames:
+            return pd.DataFrame(columns=["stock_code", "year", "season", "available_on"])
+        frame = pd.concat(frames)
+        market_caps = self.market_caps(frame.index)
+        results = []
+        for season, season_frame in frame.groupby(level="season"):
+            calculator = ColumnarCalculator(season_frame.droplevel("season"), market_caps.get(season, {}), no_new_shares)
+            scores = calculator.calculate_scores()
+            scores.columns = [
+                Screener.SCORE_KEYS[name] if key == Screener.SCORE_KEYS[name] else f"{name}.{key}"
+                for name, key in scores.columns
+            ]
+            scores.insert(0, "season", season)
+            results.append(scores.reset_index())
+        scores = pd.concat(results, ignore_index=True)
+        scores = scores[scores["year"] >= self.start_year]
+        scores.insert(3, "available_on", [self.available_on(year, season) for year, season in zip(scores["year"], scores["season"])])
+        return scores.sort_values(["stock_code", "year", "season"], ignore_index=True)
+
+    def run(self, stock_codes, on_result=None):
+        # 以執行緒池同時處理多家公司，回傳 (分數, {stock_code: 錯誤訊息})
+        frames = []
+        no_new_shares = {}
+        errors = {}
+        self.missing_reports = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.process, stock_code): stock_code for stock_code in stock_codes}
+            for future in as_completed(futures):
+                stock_code = futures[future]
+                try:
+                    frame, shares, missing = future.result()
+                except Exception as e:
+                    errors[stock_code] = f"{type(e).__name__}: {e}"
+                    metrics.increment("backfill.errors")
+                    if on_result:
+                        on_result(stock_code, 0, traceback.format_exc())
+                    continue
+                frames.append(frame)
+                no_new_shares.update(shares)
+                if missing:
+                    self.missing_reports[stock_code] = missing
+                if on_result:
+                    on_result(stock_code, len(frame), "")
+        with metrics.span("backfill.scores"):
+            return self.scores(frames, no_new_shares), errors
+
+    @staticmethod
+    def write_results(scores, path):
+        # 依副檔名輸出 Parquet（預設）或 CSV
+        if path.endswith(".csv"):
+            scores.to_csv(path, index=False, encoding="utf-8-sig")
+            return
+        scores.to_parquet(path, index=False)
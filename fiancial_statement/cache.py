@@ -0,0 +1,89 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+from fiancial_statement import metrics
+
+
+def default_cache_path(name):
+    # 快取檔案預設放在 ~/.cache/financial_statement_analyzer，可用環境變數覆寫
+    directory = os.getenv("FINANCIAL_STATEMENT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "financial_statement_analyzer"))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+
+class ResponseCache:
+
+    # "LASTEST" 查詢的結果預設保留 6 小時，歷史季度則永久保留
+    LATEST_TTL = 6 * 60 * 60
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=None, latest_ttl=None):
+        self.path = path or default_cache_path("mops.sqlite3")
+        self.latest_ttl = self.LATEST_TTL if latest_ttl is None else latest_ttl
+        self.name = os.path.splitext(os.path.basename(self.path))[0]
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, company TEXT, latest INTEGER, fetched_at REAL, body TEXT)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS responses_company ON responses (company)")
+
+    @classmethod
+    def shared(cls):
+        # 同一個程序內共用的快取實例
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(latest_ttl=int(os.getenv("FINANCIAL_STATEMENT_LATEST_TTL", cls.LATEST_TTL)))
+            return cls._shared
+
+    @staticmethod
+    def make_key(url, payload):
+        # 以網址加上排序後的請求內容做雜湊，作為快取的鍵
+        content = url + json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, url, payload):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT latest, fetched_at, body FROM responses WHERE key = ?", (self.make_key(url, payload),)
+            ).fetchone()
+        if row is None:
+            metrics.increment("cache.misses", cache=self.name)
+            return None
+        latest, fetched_at, body = row
+        if latest and time.time() - fetched_at > self.latest_ttl:
+            metrics.increment("cache.misses", cache=self.name)
+            return None
+        metrics.increment("cache.hits", cache=self.name)
+        return json.loads(body)
+
+    def set(self, url, payload, result, latest=False):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, company, latest, fetched_at, body) VALUES (?, ?, ?, ?, ?)",
+                (self.make_key(url, payload), payload.get("companyId"), int(latest), time.time(), json.dumps(result, ensure_ascii=False))
+            )
+
+    def invalidate(self, company=None, latest_only=False):
+        # 清除指定公司（或全部）的快取，latest_only 時只清除 "LASTEST" 查詢
+        conditions, parameters = [], []
+        if company is not None:
+            conditions.append("company = ?")
+            parameters.append(company)
+        if latest_only:
+            conditions.append("latest = 1")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock, self.connection:
+            return self.connection.execute(f"DELETE FROM responses{where}", parameters).rowcount
+
+    def clear(self):
+        return self.invalidate()
@@ -1,29 +1,30 @@
-import yfinance
-
-from fiancial_statement.parser import Parser
-from fiancial_statement.fetcher import Fetcher
+from fiancial_statement import metrics
+from fiancial_statement.market_cap import SnapshotMarketCapProvider
+from fiancial_statement.shares import ShareCapitalSource
 
 
 class Calculator:
 
-    def __init__(self, data, year, season):
+    def __init__(self, data, year, season, share_source=None, market_cap_provider=None):
         self.data = data # TTM
         self.year = year
         self.season = season
+        self.share_source = share_source or ShareCapitalSource.shared()
+        self.market_cap_provider = market_cap_provider or SnapshotMarketCapProvider.shared()
 
+    @metrics.timed("market_cap")
     def get_market_cap(self, stock_code):
-        stock = yfinance.Ticker(f'{stock_code}.TW')
-        market_cap = stock.info.get('marketCap', 'N/A')
+        market_cap = self.market_cap_provider.get(stock_code)
+        if market_cap is None:
+            raise ValueError(f"無法取得股票 {stock_code} 的市值")
         return market_cap
 
+    @metrics.timed("shares")
     def is_no_new_shares(self, stock_code):
-        financial_statement_fetcher = Fetcher(stock_code)
-        html_content = financial_statement_fetcher.request_distribution_profile_of_share_ownership(stock_code)
-        total_shares, year = Parser.extract_total_shares_and_year(html_content)
-        html_content = financial_statement_fetcher.request_distribution_profile_of_share_ownership(stock_code, int(year) - 1)
-        total_shares_last_year, year = Parser.extract_total_shares_and_year(html_content)
-        return total_shares == total_shares_last_year
+        # 股數資料由 ShareCapitalSource 快取，已查過的年度不需再連線
+        return self.share_source.is_no_new_shares(stock_code)
 
+    @metrics.timed("score", model="z_score")
     def calculate_z_score(self):
         print("[模型分析] 正在計算財務比率（Z-score）")
         market_cap = self.get_market_cap(self.data['stock_code'])
@@ -44,6 +45,7 @@ class Calculator:
             "標準": "小於1.8代表危險、1.8到2.9之間代表適中、大於2.9代表安全"
         }
 
+    @metrics.timed("score", model="f_score")
     def calculate_f_score(self):
         print("[模型分析] 正在計算財務比率（F-score）")
         score = 0
@@ -119,6 +121,7 @@ class Calculator:
         }
 
 
+    @metrics.timed("score", model="m_score")
     def calculate_m_score(self):
         print("[模型分析] 正在計算財務比率（M-score）")
         # Day's Sales in Receivable Index
@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+from fiancial_statement import metrics
+
+
+class ColumnarCalculator:
+
+    # 計算三種分數會用到的會計項目
+    ITEMS = (
+        "資產總額", "流動資產合計", "流動負債合計", "保留盈餘合計", "負債總額", "非流動負債合計",
+        "應收帳款淨額", "非流動資產合計", "不動產、廠房及設備",
+        "本期稅前淨利（淨損）", "利息收入", "營業收入合計", "本期淨利（淨損）", "營業成本合計",
+        "營業毛利（毛損）", "推銷費用", "管理費用",
+        "折舊費用", "攤銷費用", "營業活動之淨現金流入（流出）"
+    )
+
+    # frame 的索引為 (stock_code, year)，欄位為會計項目，數值為 TTM
+    # 公式與 Calculator 相同，缺少項目或分母為 0 時結果為 NaN
+    def __init__(self, frame, market_caps=None, no_new_shares=None):
+        self.frame = frame.sort_index()
+        companies = self.frame.index.get_level_values(0)
+        self.years = self.frame.index.get_level_values(1).to_numpy()
+        self.companies = companies
+        # 所有項目整理成一個 (列, 項目) 陣列，各欄直接以位置取出
+        self.values = self.frame.to_numpy(dtype="float64")
+        self.positions = {item_name: position for position, item_name in enumerate(self.frame.columns)}
+        self.lags = {}
+        self.market_caps = self.by_company(market_caps)
+        self.no_new_shares = self.by_company(no_new_shares)
+
+    @classmethod
+    def from_ttm(cls, ttms, market_caps=None, no_new_shares=None):
+        # 將多家公司的 TTM 字典（build_ttm 的回傳值）合併成一個 frame
+        records = {}
+        for ttm in ttms:
+            for year, items in ttm.items():
+                if year != 'stock_code':
+                    records[(ttm['stock_code'], year)] = items
+        # 直接填入 NumPy 陣列，避免 DataFrame.from_dict 逐筆推斷欄位
+        columns = list(dict.fromkeys(item_name for items in records.values() for item_name in items))
+        positions = {item_name: column for column, item_name in enumerate(columns)}
+        values = np.full((len(records), len(columns)), np.nan)
+        for row, items in enumerate(records.values()):
+            values[row, [positions[item_name] for item_name in items]] = list(items.values())
+        index = pd.MultiIndex.from_tuples(list(records), names=["stock_code", "year"])
+        return cls(pd.DataFrame(values, index=index, columns=columns), market_caps, no_new_shares)
+
+    def by_company(self, values):
+        # values 以股票代號為鍵；以 (股票代號, 年度) 為鍵時可逐年給定數值（例如歷史回補的市值）
+        if values is None:
+            return np.full(len(self.frame), np.nan)
+        values = pd.Series(values, dtype="float64")
+        if isinstance(values.index, pd.MultiIndex):
+            return values.reindex(self.frame.index).to_numpy()
+        return values.reindex(self.companies).to_numpy()
+
+    def lag(self, years_ago):
+        # 每一列對應到同一家公司 years_ago 年前的列位置，沒有該年度時為 -1，每個年數只計算一次
+        if years_ago not in self.lags:
+            index = pd.MultiIndex.from_arrays([self.companies, self.years - years_ago])
+            self.lags[years_ago] = self.frame.index.get_indexer(index)
+        return self.lags[years_ago]
+
+    def column(self, item_name, years_ago=0):
+        # 取出某個項目在 years_ago 年前的值，沒有資料時為 NaN
+        position = self.positions.get(item_name)
+        if position is None:
+            return np.full(len(self.frame), np.nan)
+        values = self.values[:, position]
+        if years_ago == 0:
+            return values
+        rows = self.lag(years_ago)
+        return np.where(rows >= 0, np.take(values, rows), np.nan)
+
+    @staticmethod
+    def divide(numerator, denominator):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(denominator != 0, numerator / denominator, np.nan)
+
+    @staticmethod
+    def point(condition, *operands):
+        # 條件成立得 1 分，任一個比較對象為 NaN 時結果為 NaN
+        missing = np.zeros(len(condition), dtype=bool)
+        for operand in operands:
+            missing |= np.isnan(operand)
+        return np.where(missing, np.nan, condition.astype("float64"))
+
+    def calculate_z_score(self):
+        total_assets = self.column("資產總額")
+        A = self.divide(self.column("流動資產合計") - self.column("流動負債合計"), total_assets)
+        B = self.divide(self.column("保留盈餘合計"), total_assets)
+        C = self.divide(self.column("本期稅前淨利（淨損）") + self.column("利息收入") + self.column("折舊費用") + self.column("攤銷費用"), total_assets)
+        D = self.divide(self.market_caps / 1000, self.column("負債總額"))
+        E = self.divide(self.column("營業收入合計"), total_assets)
+        z_score = 1.2 * A + 1.4 * B + 3.3 * C + 0.6 * D + 1 * E
+        return pd.DataFrame({
+            "營運資金 / 資產總額": A,
+            "保留盈餘 / 資產總額": B,
+            "稅前息前折舊攤銷前獲利 / 資產總額": C,
+            "股票市值 / 資產總額": D,
+            "營業收入 / 資產總額": E,
+            "Z-score": z_score
+        }, index=self.frame.index)
+
+    def calculate_f_score(self):
+        net_income = self.column("本期淨利（淨損）")
+        last_year_net_income = self.column("本期淨利（淨損）", 1)
+        total_assets = self.column("資產總額")
+        last_year_total_assets = self.column("資產總額", 1)
+        two_years_ago_total_assets = self.column("資產總額", 2)
+        revenue = self.column("營業收入合計")
+        last_year_revenue = self.column("營業收入合計", 1)
+
+        current_year_ROA = self.divide(net_income, total_assets + last_year_total_assets / 2)
+        operating_cash_flow = self.column("營業活動之淨現金流入（流出）")
+        long_term_iabilities = self.column("非流動負債合計")
+        last_year_long_term_iabilities = self.column("非流動負債合計", 1)
+        current_ratio = self.divide(self.column("流動資產合計"), self.column("流動負債合計"))
+        last_year_current_ratio = self.divide(self.column("流動資產合計", 1), self.column("流動負債合計", 1))
+        last_year_ROA = self.divide(last_year_net_income, (last_year_total_assets + two_years_ago_total_assets) / 2)
+        gross_margin = revenue - self.divide(self.column("營業成本合計"), revenue)
+        last_year_gross_margin = last_year_revenue - self.divide(self.column("營業成本合計", 1), last_year_revenue)
+        asset_turnover_ratio = self.divide(revenue, (total_assets + last_year_total_assets) / 2)
+        last_year_asset_turnover_ratio = self.divide(last_year_revenue, (last_year_total_assets + two_years_ago_total_assets) / 2)
+        zeros = np.zeros(len(self.frame))
+
+        points = np.vstack([
+            self.point(current_year_ROA > 0, current_year_ROA),
+            self.point(operating_cash_flow > 0, operating_cash_flow),
+            self.point(operating_cash_flow > net_income, operating_cash_flow, net_income),
+            self.point(long_term_iabilities < last_year_long_term_iabilities, long_term_iabilities, last_year_long_term_iabilities),
+            self.point(current_ratio > last_year_current_ratio, current_ratio, last_year_current_ratio),
+            self.point(self.no_new_shares == 1, self.no_new_shares),
+            self.point(current_year_ROA > last_year_ROA, current_year_ROA, last_year_ROA),
+            self.point(gross_margin > last_year_gross_margin, gross_margin, last_year_gross_margin),
+            self.point(asset_turnover_ratio > last_year_asset_turnover_ratio, asset_turnover_ratio, last_year_asset_turnover_ratio)
+        ])
+
+        return pd.DataFrame({
+            "當年度稅後淨利 / 當年度平均總資產": current_year_ROA,
+            "當年度營業活動之淨現金流入（流出）": operating_cash_flow,
+            "當年度本期淨利（淨損）": net_income,
+            "當年度非流動負債合計": long_term_iabilities,
+            "上一年度非流動負債合計": last_year_long_term_iabilities,
+            "當年度流動資產 / 當年度流動負債": current_ratio,
+            "上一年度流動資產 / 上一年度流動負債": last_year_current_ratio,
+            "去年無發行新股": self.no_new_shares + zeros,
+            "上一年度稅後淨利 / 上一年度平均總資產": last_year_ROA,
+            "(當年度營業收入 - 當年度營業成本) / 當年度營業收入": gross_margin,
+            "(上一年度營業收入 - 上一年度營業成本) / 上一年度營業收入": last_year_gross_margin,
+            "當年度營業收入 / 當年度平均總資產": asset_turnover_ratio,
+            "上一年度營業收入 / 上一年度平均總資產": last_year_asset_turnover_ratio,
+            # 任一項無法判斷時 F-score 為 NaN
+            "F-score": points.sum(axis=0)
+        }, index=self.frame.index)
+
+    def calculate_m_score(self):
+        revenue = self.column("營業收入合計")
+        last_year_revenue = self.column("營業收入合計", 1)
+        total_assets = self.column("資產總額")
+        last_year_total_assets = self.column("資產總額", 1)
+        divide = self.divide
+
+        dsri = divide(divide(self.column("應收帳款淨額"), revenue), divide(self.column("應收帳款淨額", 1), last_year_revenue))
+        gmi = divide(divide(self.column("營業毛利（毛損）", 1), last_year_revenue), divide(self.column("營業毛利（毛損）"), revenue))
+        aqi = divide(divide(self.column("非流動資產合計"), total_assets), divide(self.column("非流動資產合計", 1), last_year_total_assets))
+        sgi = divide(revenue, last_year_revenue)
+        depi = divide(divide(self.column("折舊費用", 1), self.column("不動產、廠房及設備", 1)), divide(self.column("折舊費用"), self.column("不動產、廠房及設備")))
+        sgai = divide(self.column("推銷費用") + divide(self.column("管理費用"), revenue), self.column("推銷費用", 1) + divide(self.column("管理費用", 1), last_year_revenue))
+        lvgi = divide(divide(self.column("負債總額"), total_assets), divide(self.column("負債總額", 1), last_year_total_assets))
+        tata = divide(self.column("本期淨利（淨損）") - self.column("營業活動之淨現金流入（流出）"), total_assets)
+
+        m_score = -4.840 + 0.920 * dsri + 0.528 * gmi + 0.404 * aqi + 0.892 * sgi + 0.115 * depi - 0.172 * sgai - 0.327 * lvgi + 4.697 * tata
+
+        return pd.DataFrame({
+            "當年度應收帳款佔營業收入的比例 / 上一年度應收帳款佔營業收入的比例": dsri,
+            "上一年度毛利率 / 當年度毛利率": gmi,
+            "當年度非流動資產佔總資產產占比 / 上一年度非流動資產佔總資產產占比": aqi,
+            "當年度營業收入 / 上一年度營業收入": sgi,
+            "上一年度折舊費用 / 當年度折舊費用": depi,
+            "當年度銷管費用占營業收入的比例 / 上一年度銷管費用占營業收入的比例": sgai,
+            "當年度總負債佔總資產的比例 / 上一年度總負債佔總資產的比例": lvgi,
+            "稅後淨利 - 營業活動現金流量 / 總資產": tata,
+            "M-score": m_score
+        }, index=self.frame.index)
+
+    @metrics.timed("score", model="columnar")
+    def calculate_scores(self):
+        # 一次計算所有公司、所有年度的三種分數
+        return pd.concat({
+            "z_score": self.calculate_z_score(),
+            "f_score": self.calculate_f_score(),
+            "m_score": self.calculate_m_score()
+        }, axis=1)
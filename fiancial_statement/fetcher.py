@@ -1,7 +1,10 @@
 import json
-import requests
-import streamlit as st
 
+from concurrent.futures import ThreadPoolExecutor
+
+from fiancial_statement import metrics
+from fiancial_statement.cache import ResponseCache
+from fiancial_statement.http_client import HttpClient
 from fiancial_statement.parser import Parser
 
 class Fetcher:
@@ -12,8 +15,25 @@ class Fetcher:
         "CF": "https://mops.twse.com.tw/mops/api/t164sb05"
      }
 
-    def __init__(self, stock_code):
+    SHARE_OWNERSHIP_URL = "https://mopsov.twse.com.tw/mops/web/ajax_t16sn02"
+
+    # 上市、上櫃有價證券清單（strMode=2 上市、strMode=4 上櫃）
+    STOCK_LIST_URLS = {
+        "TWSE": "https://isin.twse.com.tw/isin/C_public.jsp?strMode=2",
+        "TPEx": "https://isin.twse.com.tw/isin/C_public.jsp?strMode=4"
+    }
+
+    # 同時發出的請求上限，各主機的併發與速率限制由 HttpClient 處理
+    MAX_WORKERS = 8
+
+    # 完整的報表回應必須包含的欄位，缺少時不寫入快取
+    RESULT_KEYS = ("year", "season", "titles", "reportList")
+
+    def __init__(self, stock_code, cache=None, http=None):
         self.stock_code = stock_code
+        # cache 為 None 時使用共用的本機快取，傳入 False 則不使用快取
+        self.cache = ResponseCache.shared() if cache is None else cache
+        self.http = http or HttpClient.shared()
 
     def request_financial_statement(self, url, dataType, year, season):
         payload = {
@@ -23,21 +43,54 @@ class Fetcher:
             "year": year,
             "subsidiaryCompanyId": ""
         }
+        if self.cache:
+            result = self.cache.get(url, payload)
+            if result is not None:
+                return result
         headers = {
             "Content-Type":"application/json",
             "User-Agent":'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36 Edg/133.0.0.0'
         }
-        response = requests.post(url, data=json.dumps(payload), headers=headers)
-        return response.json()['result']
+        response = self.http.post(url, data=json.dumps(payload), headers=headers)
+        result = response.json()['result']
+        # 錯誤或空白的回應不寫入快取，否則歷史期別會被永久保存，之後再也不會重新抓取
+        if self.cache and self.is_complete(result):
+            self.cache.set(url, payload, result, latest=dataType == 1)
+        return result
+
+    @classmethod
+    def is_complete(cls, result):
+        return isinstance(result, dict) and all(result.get(key) is not None for key in cls.RESULT_KEYS)
 
     def fetch_data(self, type, year, season):
         # st.write(f"[取得數據] 正在抓取股票 {self.stock_code} 的資料，報表類型: {type}，年份: {year}，季度: {season}")
         url = self.BASE_URLS[type]
         dataType = 1 if year == "LASTEST" and season == "LASTEST" else 2
-        resopnse = self.request_financial_statement(url, dataType, year, season)
+        with metrics.span("fetch", type=type):
+            resopnse = self.request_financial_statement(url, dataType, year, season)
+        # 查無資料（例如上市前的期別）時 MOPS 回傳不完整的結果，以 KeyError 與連線錯誤區分
+        if not self.is_complete(resopnse):
+            raise KeyError((type, year, season))
         return int(resopnse['year']), int(resopnse['season']), Parser.extract_dates(resopnse), resopnse['reportList']
 
-    def request_distribution_profile_of_share_ownership(self, url, year = "LASTEST"):
+    def fetch_many(self, requests_, return_exceptions=False):
+        # 同時抓取多份報表，requests_ 為 (type, year, season) 的列表，回傳順序與輸入相同
+        # return_exceptions 為 True 時，失敗的請求以例外物件取代結果，不影響其他請求
+        if not requests_:
+            return []
+
+        def fetch(request):
+            try:
+                return self.fetch_data(*request)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(requests_))) as executor:
+            return list(executor.map(fetch, requests_))
+
+    def request_distribution_profile_of_share_ownership(self, year = "LASTEST"):
         data = {
             "encodeURIComponent": 1, "step": 1, "firstin": 1, "off": 1, "keyword4" : "", "code1" : "","TYPEK2": "", "checkbtn": "",
             "queryName": "co_id", "t05st29_c_ifrs": "N", "t05st30_c_ifrs": "N", "inpuType": "co_id", "TYPEK": "all",
@@ -45,5 +98,11 @@ class Fetcher:
             "co_id": self.stock_code,
             "year": year,
         }
-        response = requests.post('https://mopsov.twse.com.tw/mops/web/ajax_t16sn02', data=data)
+        response = self.http.post(self.SHARE_OWNERSHIP_URL, data=data)
+        return response.text
+
+    @classmethod
+    def request_stock_list(cls, market, http=None):
+        response = (http or HttpClient.shared()).get(cls.STOCK_LIST_URLS[market])
+        response.encoding = "cp950"
         return response.text
\ No newline at end of file
@@ -0,0 +1,120 @@
+import time
+import random
+import threading
+import requests
+
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+from fiancial_statement import metrics
+
+
+class TokenBucket:
+
+    # 每秒補充 rate 個 token，最多累積 capacity 個，每次請求消耗一個
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpClient:
+
+    # 遇到限流或伺服器錯誤時重試
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    # 各主機的速率上限（每秒請求數, 可累積的突發量）與同時連線數上限
+    HOST_RATES = {
+        "mops.twse.com.tw": (5, 5),
+        "mopsov.twse.com.tw": (2, 2)
+    }
+    DEFAULT_RATE = (5, 5)
+    HOST_CONCURRENCY = {
+        "mops.twse.com.tw": 4,
+        "mopsov.twse.com.tw": 2
+    }
+    DEFAULT_HOST_CONCURRENCY = 2
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, timeout=(5, 30), max_retries=4, backoff=0.5, max_backoff=30, pool_size=16, host_rates=None, host_concurrency=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.host_rates = {**self.HOST_RATES, **(host_rates or {})}
+        self.host_concurrency = {**self.HOST_CONCURRENCY, **(host_concurrency or {})}
+        self.buckets = {}
+        self.semaphores = {}
+        self.lock = threading.Lock()
+        # 共用連線池，保持 keep-alive 避免每次請求重新握手
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def shared(cls):
+        # 同一個程序內共用的 HttpClient
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def limits(self, url):
+        host = urlparse(url).hostname
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(*self.host_rates.get(host, self.DEFAULT_RATE))
+                self.semaphores[host] = threading.BoundedSemaphore(self.host_concurrency.get(host, self.DEFAULT_HOST_CONCURRENCY))
+            return self.buckets[host], self.semaphores[host]
+
+    def backoff_delay(self, attempt, response=None):
+        # 伺服器有提供 Retry-After 時依其指示，否則採指數退避加上隨機抖動
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(self.max_backoff, int(retry_after))
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, url, **kwargs):
+        bucket, semaphore = self.limits(url)
+        host = urlparse(url).hostname
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            bucket.acquire()
+            try:
+                with semaphore, metrics.span("http.request", host=host):
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                metrics.increment("http.bytes", len(response.content), host=host)
+                if response.status_code not in self.RETRY_STATUS:
+                    return response
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+            metrics.increment("http.retries", host=host)
+            time.sleep(self.backoff_delay(attempt, response))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+
+from fiancial_statement.cache import default_cache_path
+
+
+class IncrementalTTM:
+
+    # 保存每家公司各報表的累計季度數值與推導出的 TTM，新財報公布時只更新受影響的期別
+    # BS：TTM 即為該期快照
+    # CI/CF：TTM = 當期累計 + 去年 Q4 - 去年同期累計（Q4 即為全年）
+    def __init__(self, path=None):
+        self.path = path or default_cache_path("ttm.sqlite3")
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            for table in ("cumulative", "ttm"):
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "company TEXT, type TEXT, year INTEGER, season INTEGER, item TEXT, amount REAL, "
+                    "PRIMARY KEY (company, type, year, season, item))"
+                )
+
+    def read(self, table, company, type, year, season):
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT item, amount FROM {table} WHERE company = ? AND type = ? AND year = ? AND season = ?",
+                (company, type, year, season)
+            ).fetchall()
+        return dict(rows) if rows else None
+
+    def write(self, table, company, type, year, season, values):
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE company = ? AND type = ? AND year = ? AND season = ?",
+                (company, type, year, season)
+            )
+            self.connection.executemany(
+                f"INSERT INTO {table} (company, type, year, season, item, amount) VALUES (?, ?, ?, ?, ?, ?)",
+                [(company, type, year, season, item, amount) for item, amount in values.items()]
+            )
+
+    def cumulative(self, company, type, year, season):
+        return self.read("cumulative", company, type, year, season)
+
+    def affected_windows(self, type, year, season):
+        # 新的一期數據會影響哪些 TTM 期別
+        if type == "BS":
+            return [(year, season)]
+        windows = [(year, season), (year + 1, season)]
+        if season == 4:
+            windows += [(year + 1, 1), (year + 1, 2), (year + 1, 3)]
+        return windows
+
+    def derive(self, company, type, year, season):
+        # 由累計數值推導單一期別的 TTM，缺少所需的期別時回傳 None
+        current_value = self.cumulative(company, type, year, season)
+        if current_value is None or type == "BS" or season == 4:
+            return current_value
+        previous_q4 = self.cumulative(company, type, year - 1, 4)
+        previous_value = self.cumulative(company, type, year - 1, season)
+        if previous_q4 is None or previous_value is None:
+            return None
+        return {
+            item: amount + previous_q4.get(item, 0) - previous_value.get(item, 0)
+            for item, amount in current_value.items()
+        }
+
+    def update(self, company, type, year, season, values):
+        # 寫入一期新的累計數值，重新計算受影響的 TTM，回傳有更新的期別
+        self.write("cumulative", company, type, year, season, values)
+        updated = []
+        for window in self.affected_windows(type, year, season):
+            ttm = self.derive(company, type, *window)
+            if ttm is not None:
+                self.write("ttm", company, type, *window, ttm)
+                updated.append(window)
+        return updated
+
+    def ttm(self, company, year, season, types=("BS", "CI", "CF")):
+        # 合併各報表的 TTM，格式與 Analyzer.calculate_ttm 相同
+        data = {}
+        for type in types:
+            data.update(self.read("ttm", company, type, year, season) or {})
+        return data
+
+    def invalidate(self, company):
+        with self.lock, self.connection:
+            for table in ("cumulative", "ttm"):
+                self.connection.execute(f"DELETE FROM {table} WHERE company = ?", (company,))
@@ -0,0 +1,161 @@
+import os
+import csv
+import glob
+import time
+import datetime
+import threading
+import requests
+
+from fiancial_statement.cache import default_cache_path
+from fiancial_statement.http_client import HttpClient
+
+
+class MarketCapProvider:
+
+    # 市值來源的介面，get 回傳以元計的市值，查不到時回傳 None
+    def get(self, stock_code):
+        raise NotImplementedError
+
+    def snapshot(self, date):
+        # 不晚於 date 的整個市場市值，回傳 (快照日期, {stock_code: 市值})，不支援歷史市值的來源回傳 (None, {})
+        return None, {}
+
+
+class SnapshotMarketCapProvider(MarketCapProvider):
+
+    # 整個市場的每日市值快照（發行股數 × 收盤價），存成 market_cap_YYYYMMDD.csv
+    # 上市：證交所 OpenAPI，上櫃：櫃買中心 OpenAPI
+    SOURCES = {
+        "TWSE": (
+            "https://openapi.twse.com.tw/v1/exchangeReport/STOCK_DAY_ALL",
+            "https://openapi.twse.com.tw/v1/opendata/t187ap03_L"
+        ),
+        "TPEx": (
+            "https://www.tpex.org.tw/openapi/v1/tpex_mainboard_daily_close_quotes",
+            "https://www.tpex.org.tw/openapi/v1/mopsfin_t187ap03_O"
+        )
+    }
+    CODE_KEYS = ("Code", "SecuritiesCompanyCode", "公司代號")
+    CLOSE_KEYS = ("ClosingPrice", "Close")
+    SHARES_KEYS = ("已發行普通股數或TDR原股發行股數", "IssueShares")
+    FILE_PATTERN = "market_cap_*.csv"
+    # 下載失敗後至少間隔此秒數才重新下載
+    RETRY_INTERVAL = 300
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, directory=None, date=None, auto_refresh=False, http=None):
+        self.directory = directory or default_cache_path("market_cap")
+        self.date = date
+        self.auto_refresh = auto_refresh
+        self.http = http
+        self.snapshot_date = None
+        self.market_caps = None
+        self.loaded_on = None
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        # 程式共用的實例，當天沒有快照時自動下載一次
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(auto_refresh=True)
+            return cls._shared
+
+    def snapshot_path(self, date):
+        return os.path.join(self.directory, f"market_cap_{date:%Y%m%d}.csv")
+
+    def snapshot_dates(self):
+        dates = []
+        for path in glob.glob(os.path.join(self.directory, self.FILE_PATTERN)):
+            try:
+                dates.append(datetime.datetime.strptime(os.path.basename(path)[11:19], "%Y%m%d").date())
+            except ValueError:
+                continue
+        return sorted(dates)
+
+    def snapshot(self, date):
+        # 讀取不晚於 date 的最新一份快照，不影響 get 使用的快照
+        dates = [snapshot_date for snapshot_date in self.snapshot_dates() if snapshot_date <= date]
+        if not dates:
+            return None, {}
+        with open(self.snapshot_path(dates[-1]), newline="", encoding="utf-8") as file:
+            return dates[-1], {row["stock_code"]: float(row["market_cap"]) for row in csv.DictReader(file)}
+
+    def load(self, date=None):
+        # 載入不晚於 date 的最新一份快照供 get 使用，回傳快照日期（沒有快照時為 None）
+        self.snapshot_date, self.market_caps = self.snapshot(date or self.date or datetime.date.today())
+        return self.snapshot_date
+
+    def get(self, stock_code):
+        with self.lock:
+            # 長時間執行的程式跨日後重新載入，loaded_on 只在載入（及下載）成功後更新
+            today = datetime.date.today()
+            if (self.market_caps is None or self.loaded_on != today) and time.monotonic() >= self.retry_at:
+                self.load()
+                try:
+                    # 只有要求的是今天的市值時才下載，指定過去日期時只能使用既有的快照
+                    if self.auto_refresh and self.date in (None, today) and self.snapshot_date != today:
+                        self.refresh()
+                    self.loaded_on = today
+                except (requests.RequestException, ValueError):
+                    # 下載失敗時暫時沿用較舊的快照，等待 RETRY_INTERVAL 秒後再試
+                    self.retry_at = time.monotonic() + self.RETRY_INTERVAL
+                    if self.snapshot_date is None:
+                        raise
+        return self.market_caps.get(str(stock_code))
+
+    @classmethod
+    def field(cls, row, keys):
+        for key in keys:
+            if row.get(key) not in (None, ""):
+                return row[key]
+        return None
+
+    def download(self):
+        # 一次下載上市、上櫃所有股票的收盤價與發行股數，回傳 {stock_code: (shares, close)}
+        http = self.http or HttpClient.shared()
+        result = {}
+        for quotes_url, profile_url in self.SOURCES.values():
+            closes = {}
+            for row in http.get(quotes_url).json():
+                code, close = self.field(row, self.CODE_KEYS), self.field(row, self.CLOSE_KEYS)
+                try:
+                    closes[code] = float(close.replace(",", ""))
+                except (AttributeError, ValueError):
+                    continue
+            for row in http.get(profile_url).json():
+                code, shares = self.field(row, self.CODE_KEYS), self.field(row, self.SHARES_KEYS)
+                if code in closes and shares:
+                    result[code] = (int(shares.replace(",", "")), closes[code])
+        return result
+
+    def refresh(self):
+        # download 只能取得今天的收盤資料，因此快照一律以今天的日期保存；歷史快照需另以 write_snapshot 匯入
+        date = datetime.date.today()
+        self.write_snapshot(self.directory, date, self.download())
+        self.load(date)
+
+    @classmethod
+    def write_snapshot(cls, directory, date, quotes):
+        # quotes 為 {stock_code: (shares, close)}，先寫入暫存檔再改名，避免讀到寫到一半的快照
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"market_cap_{date:%Y%m%d}.csv")
+        with open(path + ".tmp", "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["stock_code", "shares", "close", "market_cap"])
+            for stock_code, (shares, close) in sorted(quotes.items()):
+                writer.writerow([stock_code, shares, close, shares * close])
+        os.replace(path + ".tmp", path)
+        return path
+
+
+class YFinanceMarketCapProvider(MarketCapProvider):
+
+    # 逐檔向 yfinance 查詢，速度慢，僅在沒有快照時作為備援
+    def get(self, stock_code):
+        import yfinance
+        market_cap = yfinance.Ticker(f'{stock_code}.TW').info.get('marketCap')
+        return float(market_cap) if market_cap else None
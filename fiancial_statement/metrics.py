@@ -0,0 +1,233 @@
+import os
+import time
+import logging
+import tempfile
+import functools
+import threading
+
+from collections import defaultdict
+
+# 輕量的量測層：以 span 記錄各階段耗時、以 increment 累計計數，交給可替換的 sink 輸出
+# 沒有設定 sink 時 span 回傳共用的空物件，幾乎不增加成本
+
+_sink = None
+
+logger = logging.getLogger("fiancial_statement.metrics")
+
+
+def set_sink(sink):
+    global _sink
+    _sink = sink
+    return sink
+
+
+def get_sink():
+    return _sink
+
+
+def configure(spec=None):
+    # 依設定字串啟用 sink："log"、"memory"、"prometheus:/path/metrics.prom"，預設讀取 FINANCIAL_STATEMENT_METRICS
+    spec = os.getenv("FINANCIAL_STATEMENT_METRICS", "") if spec is None else spec
+    if not spec:
+        return set_sink(None)
+    if spec == "log":
+        return set_sink(LogSink())
+    if spec == "memory":
+        return set_sink(InMemorySink())
+    if spec.startswith("prometheus:"):
+        return set_sink(PrometheusTextFileSink(spec.split(":", 1)[1]))
+    raise ValueError(f"無法辨識的 metrics 設定: {spec}")
+
+
+class NullSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+
+    def __init__(self, sink, name, labels):
+        self.sink = sink
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        record(self.sink.record_span, self.name, time.perf_counter() - self.start, self.labels, exc_type is not None)
+        return False
+
+
+def record(method, *args):
+    # 量測失敗只記錄 log，不影響被量測的流程
+    try:
+        method(*args)
+    except Exception:
+        logger.exception("metrics sink 寫入失敗")
+
+
+def span(name, **labels):
+    sink = _sink
+    if sink is None:
+        return NULL_SPAN
+    return Span(sink, name, labels)
+
+
+def increment(name, value=1, **labels):
+    sink = _sink
+    if sink is not None:
+        record(sink.increment, name, value, labels)
+
+
+def observe(name, seconds, **labels):
+    # 直接記錄一段已量好的耗時，用於無法以 with 包住的情況（例如串流的第一個 token）
+    sink = _sink
+    if sink is not None:
+        record(sink.record_span, name, seconds, labels, False)
+
+
+def timed(name, **labels):
+    # 以 span 包住整個函式的裝飾器
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _sink is None:
+                return function(*args, **kwargs)
+            with span(name, **labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class InMemorySink:
+
+    # 保留所有紀錄，供測試與效能測試檢查
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = []
+        self.counters = defaultdict(float)
+
+    def record_span(self, name, seconds, labels, error):
+        with self.lock:
+            self.spans.append((name, seconds, labels, error))
+
+    def increment(self, name, value, labels):
+        with self.lock:
+            self.counters[(name, label_key(labels))] += value
+
+    def summary(self):
+        # 依 span 名稱彙總 {name: (次數, 總秒數)}
+        result = defaultdict(lambda: [0, 0.0])
+        with self.lock:
+            for name, seconds, _, _ in self.spans:
+                result[name][0] += 1
+                result[name][1] += seconds
+        return {name: tuple(value) for name, value in result.items()}
+
+    def counter(self, name, **labels):
+        with self.lock:
+            if labels:
+                return self.counters.get((name, label_key(labels)), 0)
+            return sum(value for (counter_name, _), value in self.counters.items() if counter_name == name)
+
+
+class LogSink:
+
+    # 每筆紀錄輸出一行 log
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("fiancial_statement.metrics")
+        self.level = level
+
+    @staticmethod
+    def format_labels(labels):
+        return " ".join(f"{key}={value}" for key, value in labels.items())
+
+    def record_span(self, name, seconds, labels, error):
+        self.logger.log(self.level, "span %s %.2fms %s%s", name, seconds * 1000, self.format_labels(labels), " error" if error else "")
+
+    def increment(self, name, value, labels):
+        self.logger.log(self.level, "counter %s +%s %s", name, value, self.format_labels(labels))
+
+
+class PrometheusTextFileSink:
+
+    # 彙總後寫成 Prometheus textfile 格式（供 node_exporter textfile collector 讀取），每 interval 秒寫一次
+    def __init__(self, path, interval=10):
+        self.path = path
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.spans = defaultdict(lambda: [0, 0.0, 0])
+        self.written_at = 0.0
+
+    def record_span(self, name, seconds, labels, error):
+        with self.lock:
+            summary = self.spans[(name, label_key(labels))]
+            summary[0] += 1
+            summary[1] += seconds
+            summary[2] += int(error)
+        self.flush_if_due()
+
+    def increment(self, name, value, labels):
+        with self.lock:
+            self.counters[(name, label_key(labels))] += value
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        # 檢查與更新 written_at 在同一個鎖內完成，同一時間只有一個執行緒負責寫檔
+        with self.lock:
+            now = time.monotonic()
+            if now - self.written_at < self.interval:
+                return
+            self.written_at = now
+        self.flush()
+
+    @staticmethod
+    def metric_name(name):
+        return "financial_statement_" + name.replace(".", "_").replace("-", "_")
+
+    @staticmethod
+    def format_labels(labels):
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{self.metric_name(name)}_total{self.format_labels(labels)} {value}")
+            for (name, labels), (count, seconds, errors) in sorted(self.spans.items()):
+                metric = self.metric_name(name)
+                lines.append(f"{metric}_seconds_count{self.format_labels(labels)} {count}")
+                lines.append(f"{metric}_seconds_sum{self.format_labels(labels)} {seconds}")
+                lines.append(f"{metric}_errors_total{self.format_labels(labels)} {errors}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        # 先寫入各自的暫存檔再改名，避免被讀到寫到一半的內容，也避免多個執行緒互相覆寫暫存檔
+        with self.flush_lock:
+            content = self.render()
+            descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+            try:
+                with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                    file.write(content)
+                os.replace(temporary_path, self.path)
+            except BaseException:
+                if os.path.exists(temporary_path):
+                    os.remove(temporary_path)
+                raise
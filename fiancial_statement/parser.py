@@ -1,34 +1,76 @@
 import re
+import functools
 
-from bs4 import BeautifulSoup
+import numpy as np
+
+SEASON_PATTERN = re.compile(r"(\d+)年(?:第|前)?(\d+)季")
+ANNUAL_PATTERN = re.compile(r"(\d+)年度")
+YEAR_PATTERN = re.compile(r"(\d+)年")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# 只比對相鄰的儲存格，格式不符時回到 lxml 解析，而不會跨到其他列擷取錯誤的數字
+TOTAL_SHARES_PATTERN = re.compile(r"<td[^>]*>\s*實際發行總股數\s*</td>\s*<td[^>]*>[^<]*</td>\s*<td[^>]*>\s*([\d,]+)\s*</td>")
+Q2V_PATTERN = re.compile(r"<input\b(?=[^>]*\bname=[\"']?Q2V\b)[^>]*\bvalue=[\"']?(\d+)", re.I)
+SEASON_MAPPING = {"12月31日": 4, "09月30日": 3, "06月30日": 2, "03月31日": 1}
 
 class Parser:
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def parse_date(date_string):
         # 匹配 "XXX年第Y季" 格式
-        match = re.search(r"(\d+)年(?:第|前)?(\d+)季", date_string)
+        match = SEASON_PATTERN.search(date_string)
         if match:
             return int(match.group(1)), int(match.group(2))
 
         # 匹配 "XXX年度"，預設為 Q4
-        match = re.search(r"(\d+)年度", date_string)
+        match = ANNUAL_PATTERN.search(date_string)
         if match:
             return int(match.group(1)), 4
 
         # 匹配 "XXX年MM月DD日"，對應季度
-        season_mapping = {"12月31日": 4, "09月30日": 3, "06月30日": 2, "03月31日": 1}
-        for season_date, season in season_mapping.items():
+        for season_date, season in SEASON_MAPPING.items():
             if season_date in date_string:
-                match = re.search(r"(\d+)年", date_string)
+                match = YEAR_PATTERN.search(date_string)
                 if match:
                     return int(match.group(1)), season
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def normalize_item_name(item_name):
+        # 去除項目名稱中的空白，相同名稱只處理一次
+        return WHITESPACE_PATTERN.sub('', item_name)
+
+    @staticmethod
+    def parse_amounts(datas, columns):
+        # 一次將整份報表的數值欄位轉成 (列, 欄) 的 float64 陣列，空白欄位為 NaN
+        if not datas or not columns:
+            return np.empty((len(datas), len(columns)))
+        text = "\t".join([data[column] for data in datas for column in columns]).replace(",", "").replace(" ", "")
+        cells = [cell or "nan" for cell in text.split("\t")]
+        return np.array(cells, dtype="float64").reshape(len(datas), len(columns))
     @staticmethod
     def extract_dates(resopnse):
         return [title['main'] for title in resopnse['titles'] if title['main'] != "會計項目"]
 
     @staticmethod
     def extract_total_shares_and_year(html_content):
-        soup = BeautifulSoup(html_content, "html.parser")
+        # 先以正規表示式直接擷取，格式不符時才建立完整的 HTML 樹
+        shares = TOTAL_SHARES_PATTERN.search(html_content)
+        year = Q2V_PATTERN.search(html_content)
+        if shares and year:
+            return int(shares.group(1).replace(",", "")), year.group(1)
+        # 只有格式不符預期時才需要 bs4，延後到此時才載入
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html_content, "lxml")
         target_td = soup.find("td", string="實際發行總股數")
+        q2v = soup.find("input", {"name": "Q2V"})
+        # 查無資料（例如上市前的年度）的頁面沒有股數欄位
+        if target_td is None or q2v is None:
+            raise ValueError("找不到實際發行總股數")
         next_td = target_td.find_next_sibling("td").find_next_sibling("td")
-        return int(next_td.text.strip().replace(",", "")), soup.find("input", {"name": "Q2V"})["value"]
\ No newline at end of file
+        # 儲存格可能帶有單位等文字，例如「25,930,380,458 股」，只保留數字
+        return int(re.sub(r"\D", "", next_td.text)), q2v["value"]
+
+    @staticmethod
+    def extract_stock_codes(html_content):
+        # 擷取清單中四碼的股票代號（格式為「2330　台積電」）
+        return list(dict.fromkeys(re.findall(r"<td[^>]*>(\d{4})\u3000[^<]*</td>", html_content)))
\ No newline at end of file
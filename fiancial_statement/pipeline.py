@@ -0,0 +1,55 @@
+from fiancial_statement.analyzer import Analyzer
+from fiancial_statement.calculator import Calculator
+from fiancial_statement.fetcher import Fetcher
+from fiancial_statement.warehouse import Warehouse
+
+
+def build_ttm(stock_code, years=3, cache=None, warehouse=None):
+    # 抓取並整理最近幾年的 TTM 資料，回傳 (ttm, year, season)
+    analyzer = Analyzer(stock_code, cache, warehouse=warehouse)
+    analyzer.retrieve_all(years=years)
+    year = analyzer.year
+    season = analyzer.season
+    ttm = {'stock_code': stock_code}
+    for offset in range(years):
+        ttm[year - offset] = analyzer.calculate_ttm(year - offset, season)
+    return ttm, year, season
+
+
+def stored_ttm(stock_code, year=None, season=None, years=3, warehouse=None):
+    # 不重新抓取，直接由 Warehouse 中已保存的財報計算 TTM，格式與 build_ttm 相同；未指定期別時使用已保存的最新一期
+    warehouse = warehouse or Warehouse.shared()
+    if year is None or season is None:
+        period = warehouse.latest_period(stock_code)
+        if period is None:
+            raise KeyError(stock_code)
+        year, season = period
+    analyzer = Analyzer(stock_code)
+    warehouse.load(stock_code, analyzer.result)
+    ttm = {'stock_code': stock_code}
+    for offset in range(years):
+        ttm[year - offset] = analyzer.calculate_ttm(year - offset, season)
+    return ttm, year, season
+
+
+def calculate_scores(ttm, year, season):
+    # 計算 Z-score、F-score、M-score
+    calculator = Calculator(ttm, year, season)
+    return {
+        'z_score': calculator.calculate_z_score(),
+        'f_score': calculator.calculate_f_score(),
+        'm_score': calculator.calculate_m_score()
+    }
+
+
+def refresh_ttm(stock_code, incremental, cache=None):
+    # 新一季財報公布時，只抓取最新一期並更新 IncrementalTTM 中受影響的期別
+    analyzer = Analyzer(stock_code, cache)
+    updated = analyzer.update_incremental(incremental)
+    return updated, analyzer.year, analyzer.season
+
+
+def latest_period(stock_code, cache=None):
+    # 最新一期財報的 (year, season)，作為結果快取的鍵
+    year, season, _, _ = Fetcher(stock_code, cache).fetch_data("CF", "LASTEST", "LASTEST")
+    return year, season
@@ -0,0 +1,101 @@
+import os
+import csv
+import json
+import threading
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from fiancial_statement.fetcher import Fetcher
+from fiancial_statement.parser import Parser
+from fiancial_statement.pipeline import build_ttm, calculate_scores
+
+
+class Screener:
+
+    SCORE_KEYS = {"z_score": "Z-score", "f_score": "F-score", "m_score": "M-score"}
+
+    def __init__(self, checkpoint_path, max_workers=8, cache=None, retry_failed=True, warehouse=None):
+        self.checkpoint_path = checkpoint_path
+        self.max_workers = max_workers
+        self.cache = cache
+        self.warehouse = warehouse
+        self.retry_failed = retry_failed
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def load_stock_codes(source):
+        # source 可以是股票代號清單檔（每行一個），或 "TWSE"、"TPEx"、"ALL" 代表整個市場
+        if source in Fetcher.STOCK_LIST_URLS:
+            return Parser.extract_stock_codes(Fetcher.request_stock_list(source))
+        if source == "ALL":
+            return list(dict.fromkeys(Screener.load_stock_codes("TWSE") + Screener.load_stock_codes("TPEx")))
+        with open(source, encoding="utf-8") as file:
+            return list(dict.fromkeys(line.strip() for line in file if line.strip() and not line.startswith("#")))
+
+    def load_checkpoint(self):
+        # 讀取先前已完成的結果，檔案最後一行可能因中斷而不完整
+        rows = {}
+        if not os.path.exists(self.checkpoint_path):
+            return rows
+        with open(self.checkpoint_path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                rows[row["stock_code"]] = row
+        return rows
+
+    def save_checkpoint(self, row):
+        with self.lock, open(self.checkpoint_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            file.flush()
+
+    def screen(self, stock_code):
+        # 單一股票的分析，失敗時只記錄錯誤，不影響其他股票
+        row = {"stock_code": stock_code}
+        try:
+            ttm, year, season = build_ttm(stock_code, cache=self.cache, warehouse=self.warehouse)
+            row.update({"year": year, "season": season})
+            for name, scores in calculate_scores(ttm, year, season).items():
+                for key, value in scores.items():
+                    if key == "標準":
+                        continue
+                    row[self.SCORE_KEYS[name] if key == self.SCORE_KEYS[name] else f"{name}.{key}"] = value
+            row["error"] = ""
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+            row["traceback"] = traceback.format_exc()
+        return row
+
+    def run(self, stock_codes, on_result=None):
+        # 略過檢查點中已完成的股票，其餘交給執行緒池處理
+        results = self.load_checkpoint()
+        pending = [
+            stock_code for stock_code in stock_codes
+            if stock_code not in results or (self.retry_failed and results[stock_code].get("error"))
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.screen, stock_code) for stock_code in pending]
+            for future in as_completed(futures):
+                row = future.result()
+                self.save_checkpoint(row)
+                results[row["stock_code"]] = row
+                if on_result:
+                    on_result(row)
+        return [results[stock_code] for stock_code in stock_codes if stock_code in results]
+
+    @staticmethod
+    def write_results(rows, path):
+        # 依副檔名輸出 Parquet 或 CSV
+        rows = [{key: value for key, value in row.items() if key != "traceback"} for row in rows]
+        if path.endswith(".parquet"):
+            import pandas as pd
+            pd.DataFrame(rows).to_parquet(path, index=False)
+            return
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        with open(path, "w", newline="", encoding="utf-8-sig") as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
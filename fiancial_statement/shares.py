@@ -0,0 +1,89 @@
+import time
+import sqlite3
+import threading
+
+from fiancial_statement import metrics
+from fiancial_statement.cache import default_cache_path
+from fiancial_statement.fetcher import Fetcher
+from fiancial_statement.parser import Parser
+
+
+class ShareCapitalSource:
+
+    # 各公司每年的實際發行總股數，歷史年度永久保存，最新年度的對應每 LATEST_TTL 秒重新查詢
+    LATEST_TTL = 24 * 60 * 60
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=None, latest_ttl=None, cache=None, http=None):
+        self.path = path or default_cache_path("shares.sqlite3")
+        self.latest_ttl = self.LATEST_TTL if latest_ttl is None else latest_ttl
+        self.cache = cache
+        self.http = http
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS shares (company TEXT, year INTEGER, total_shares INTEGER, PRIMARY KEY (company, year))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS latest (company TEXT PRIMARY KEY, year INTEGER, fetched_at REAL)"
+            )
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def fetch(self, stock_code, year):
+        html_content = Fetcher(stock_code, self.cache, self.http).request_distribution_profile_of_share_ownership(year)
+        total_shares, year = Parser.extract_total_shares_and_year(html_content)
+        year = int(year)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO shares (company, year, total_shares) VALUES (?, ?, ?)", (stock_code, year, total_shares)
+            )
+        return total_shares, year
+
+    def latest_year(self, stock_code):
+        # 最新有資料的年度，過期或尚未查詢時重新抓取一次
+        with self.lock:
+            row = self.connection.execute("SELECT year, fetched_at FROM latest WHERE company = ?", (stock_code,)).fetchone()
+        if row is not None and time.time() - row[1] <= self.latest_ttl:
+            return row[0]
+        _, year = self.fetch(stock_code, "LASTEST")
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO latest (company, year, fetched_at) VALUES (?, ?, ?)", (stock_code, year, time.time())
+            )
+        return year
+
+    def issued_shares(self, stock_code, year="LASTEST"):
+        # 回傳 (實際發行總股數, 年度)
+        if year == "LASTEST":
+            year = self.latest_year(stock_code)
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT total_shares FROM shares WHERE company = ? AND year = ?", (stock_code, int(year))
+            ).fetchone()
+        if row is not None:
+            metrics.increment("cache.hits", cache="shares")
+            return row[0], int(year)
+        metrics.increment("cache.misses", cache="shares")
+        return self.fetch(stock_code, year)
+
+    def is_no_new_shares(self, stock_code, year="LASTEST"):
+        # 與前一年度比較，股數相同代表沒有發行新股
+        total_shares, year = self.issued_shares(stock_code, year)
+        total_shares_last_year, _ = self.issued_shares(stock_code, year - 1)
+        return total_shares == total_shares_last_year
+
+    def invalidate(self, stock_code=None):
+        where, parameters = (" WHERE company = ?", (stock_code,)) if stock_code is not None else ("", ())
+        with self.lock, self.connection:
+            for table in ("shares", "latest"):
+                self.connection.execute(f"DELETE FROM {table}{where}", parameters)
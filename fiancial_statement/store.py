@@ -0,0 +1,139 @@
+import sys
+import threading
+
+import numpy as np
+
+
+class ItemVocabulary:
+
+    # 會計項目名稱與整數編號的對照表，所有公司共用同一份，項目名稱只存一次
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        self.lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def id(self, item_name):
+        item_id = self.ids.get(item_name)
+        if item_id is None:
+            with self.lock:
+                item_id = self.ids.get(item_name)
+                if item_id is None:
+                    item_id = len(self.names)
+                    self.names.append(sys.intern(item_name))
+                    self.ids[self.names[item_id]] = item_id
+        return item_id
+
+    def __len__(self):
+        return len(self.names)
+
+
+class StatementStore:
+
+    # 單一公司的財報數據，以 (期別, 項目) 索引的 float64 陣列儲存，沒有數據的位置為 NaN
+    COLUMN_CHUNK = 64
+
+    def __init__(self, vocabulary=None):
+        self.vocabulary = ItemVocabulary.shared() if vocabulary is None else vocabulary
+        self.periods = {}
+        self.values = np.full((4, self.COLUMN_CHUNK), np.nan)
+
+    def reserve(self, rows, columns):
+        # 依需要擴充陣列，列數倍增、欄數以 COLUMN_CHUNK 為單位增加
+        capacity_rows, capacity_columns = self.values.shape
+        if rows <= capacity_rows and columns <= capacity_columns:
+            return
+        rows = max(rows, capacity_rows * 2 if rows > capacity_rows else capacity_rows)
+        columns = max(capacity_columns, -(-columns // self.COLUMN_CHUNK) * self.COLUMN_CHUNK)
+        values = np.full((rows, columns), np.nan)
+        values[:capacity_rows, :capacity_columns] = self.values
+        self.values = values
+
+    def row(self, year, season, create=False):
+        row = self.periods.get((year, season))
+        if row is None and create:
+            row = len(self.periods)
+            self.reserve(row + 1, len(self.vocabulary))
+            self.periods[(year, season)] = row
+        return row
+
+    def set(self, year, season, item_name, amount):
+        row = self.row(year, season, create=True)
+        item_id = self.vocabulary.id(item_name)
+        self.reserve(row + 1, item_id + 1)
+        self.values[row, item_id] = amount
+
+    def set_many(self, year, season, item_ids, amounts):
+        # 一次寫入多個項目，amounts 中的 NaN 代表沒有數據，不覆寫原本的值
+        row = self.row(year, season, create=True)
+        self.reserve(row + 1, len(self.vocabulary))
+        item_ids = np.asarray(item_ids)
+        amounts = np.asarray(amounts, dtype="float64")
+        present = ~np.isnan(amounts)
+        self.values[row, item_ids[present]] = amounts[present]
+
+    def get(self, year, season, item_name, default=None):
+        row = self.periods.get((year, season))
+        item_id = self.vocabulary.ids.get(item_name)
+        if row is None or item_id is None or item_id >= self.values.shape[1]:
+            return default
+        value = self.values[row, item_id]
+        return default if np.isnan(value) else float(value)
+
+    def has_period(self, year, season):
+        return (year, season) in self.periods
+
+    def vector(self, year, season, default=np.nan, size=None):
+        # 回傳某一期所有項目的數值（長度等於項目總數），沒有數據的位置填入 default
+        # 共用的 ItemVocabulary 可能同時被其他執行緒擴充，需要多個等長向量時由呼叫端傳入同一個 size
+        if size is None:
+            size = len(self.vocabulary)
+        row = self.periods.get((year, season))
+        if row is None:
+            return np.full(size, default)
+        self.reserve(row + 1, size)
+        values = self.values[row, :size]
+        if np.isnan(default):
+            return values.copy()
+        return np.where(np.isnan(values), default, values)
+
+    def period(self, year, season):
+        # 以 {項目名稱: 數值} 的形式回傳某一期的數據
+        size = len(self.vocabulary)
+        values = self.vector(year, season, size=size)
+        names = self.vocabulary.names[:size]
+        return {names[item_id]: float(values[item_id]) for item_id in np.flatnonzero(~np.isnan(values))}
+
+    def to_dict(self):
+        result = {}
+        for year, season in self.periods:
+            result.setdefault(year, {})[season] = self.period(year, season)
+        return result
+
+    def compact(self):
+        # 釋放多預留的空間
+        self.values = self.values[:len(self.periods), :len(self.vocabulary)].copy()
+
+    @staticmethod
+    def pack(stores, periods):
+        # 將多家公司的數據打包成一個連續的 (公司, 期別, 項目) 陣列，供整個市場一次運算
+        vocabulary = stores[0].vocabulary if stores else ItemVocabulary.shared()
+        block = np.full((len(stores), len(periods), len(vocabulary)), np.nan)
+        for company, store in enumerate(stores):
+            if store.vocabulary is not vocabulary:
+                raise ValueError("所有 StatementStore 必須共用同一份 ItemVocabulary")
+            for index, (year, season) in enumerate(periods):
+                row = store.periods.get((year, season))
+                if row is not None:
+                    columns = min(store.values.shape[1], len(vocabulary))
+                    block[company, index, :columns] = store.values[row, :columns]
+        return block
@@ -0,0 +1,163 @@
+import json
+import itertools
+import sqlite3
+import threading
+
+import numpy as np
+
+from fiancial_statement.cache import default_cache_path
+from fiancial_statement.store import StatementStore
+
+
+class Warehouse:
+
+    # 保存所有公司解析後的財報（各期累計數值），可跨公司查詢同一期，或查詢單一公司的時間序列
+    # 項目名稱另存於 items 表，statements 只存整數編號
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = path or default_cache_path("warehouse.sqlite3")
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS statements ("
+                "company TEXT, year INTEGER, season INTEGER, item INTEGER, amount REAL, "
+                "PRIMARY KEY (company, year, season, item)) WITHOUT ROWID"
+            )
+            # 橫斷面查詢（某一期所有公司的某個項目）
+            self.connection.execute("CREATE INDEX IF NOT EXISTS statements_item ON statements (item, year, season)")
+            self.item_ids = dict(self.connection.execute("SELECT name, id FROM items"))
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def ids(self, item_names, create=False):
+        # 項目名稱對應的編號，create 為 True 時登記新的項目，否則查不到的項目為 None
+        with self.lock:
+            missing = [item_name for item_name in dict.fromkeys(item_names) if item_name not in self.item_ids]
+            if missing and create:
+                with self.connection:
+                    self.connection.executemany("INSERT OR IGNORE INTO items (name) VALUES (?)", [(item_name,) for item_name in missing])
+                    self.item_ids.update(self.connection.execute(
+                        f"SELECT name, id FROM items WHERE name IN ({','.join('?' * len(missing))})", missing
+                    ))
+            return [self.item_ids.get(item_name) for item_name in item_names]
+
+    def write(self, company, store):
+        # 寫入 StatementStore 中所有期別的數值，已存在的數值以新的覆寫
+        names = store.vocabulary.names
+        periods = list(store.periods)
+        values = store.values[[store.periods[period] for period in periods], :len(names)]
+        indexes, columns = np.nonzero(~np.isnan(values))
+        used = np.unique(columns).tolist()
+        item_ids = dict(zip(used, self.ids([names[column] for column in used], create=True)))
+        rows = [
+            (company, *periods[index], item_ids[column], amount)
+            for index, column, amount in zip(indexes.tolist(), columns.tolist(), values[indexes, columns].tolist())
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO statements (company, year, season, item, amount) VALUES (?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def load(self, company, store=None):
+        # 將某家公司已保存的所有期別讀回 StatementStore，可直接交給 Analyzer.calculate_ttm
+        store = store or StatementStore()
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT year, season, name, amount FROM statements JOIN items ON items.id = statements.item "
+                "WHERE company = ? ORDER BY year, season", (company,)
+            ).fetchall()
+        for (year, season), group in itertools.groupby(rows, key=lambda row: row[:2]):
+            group = list(group)
+            store.set_many(year, season, [store.vocabulary.id(row[2]) for row in group], [row[3] for row in group])
+        store.compact()
+        return store
+
+    def latest_period(self, company):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT year, season FROM statements WHERE company = ? ORDER BY year DESC, season DESC LIMIT 1", (company,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def companies(self):
+        with self.lock:
+            return [row[0] for row in self.connection.execute("SELECT DISTINCT company FROM statements ORDER BY company")]
+
+    def cross_section(self, item_name, year, season):
+        # 某一期所有公司的某個項目，回傳以股票代號為索引的 Series
+        import pandas as pd
+        item_id, = self.ids([item_name])
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT company, amount FROM statements WHERE item = ? AND year = ? AND season = ? ORDER BY company",
+                (item_id, year, season)
+            ).fetchall()
+        return pd.Series(dict(rows), name=item_name, dtype="float64").rename_axis("stock_code")
+
+    def time_series(self, company, item_name):
+        # 單一公司某個項目的各期數值，回傳以 (year, season) 為索引的 Series
+        import pandas as pd
+        item_id, = self.ids([item_name])
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT year, season, amount FROM statements WHERE company = ? AND item = ? ORDER BY year, season",
+                (company, item_id)
+            ).fetchall()
+        index = pd.MultiIndex.from_tuples([row[:2] for row in rows], names=["year", "season"])
+        return pd.Series([row[2] for row in rows], index=index, name=item_name, dtype="float64")
+
+    def export_block(self, path, item_names, periods=None, companies=None):
+        # 匯出 (公司, 期別, 項目) 的 float64 陣列為 .npy，座標軸另存於 path + ".json"，供 load_block 以記憶體映射載入
+        companies = companies or self.companies()
+        item_ids = self.ids(item_names)
+        known = [item_id for item_id in item_ids if item_id is not None]
+        rows = []
+        if known and companies:
+            with self.lock:
+                rows = self.connection.execute(
+                    f"SELECT company, year, season, item, amount FROM statements WHERE item IN ({','.join('?' * len(known))})", known
+                ).fetchall()
+        if periods is None:
+            periods = sorted({row[1:3] for row in rows})
+        company_index = {company: index for index, company in enumerate(companies)}
+        period_index = {tuple(period): index for index, period in enumerate(periods)}
+        item_index = {item_id: index for index, item_id in enumerate(item_ids) if item_id is not None}
+        rows = [row for row in rows if row[0] in company_index and row[1:3] in period_index]
+        block = np.lib.format.open_memmap(path, mode="w+", dtype="float64", shape=(len(companies), len(periods), len(item_names)))
+        block[:] = np.nan
+        if rows:
+            block[
+                [company_index[row[0]] for row in rows],
+                [period_index[row[1:3]] for row in rows],
+                [item_index[row[3]] for row in rows]
+            ] = [row[4] for row in rows]
+        block.flush()
+        with open(path + ".json", "w", encoding="utf-8") as file:
+            json.dump({"companies": list(companies), "periods": [list(period) for period in periods], "items": list(item_names)}, file, ensure_ascii=False)
+        return path
+
+    @staticmethod
+    def load_block(path):
+        # 以唯讀記憶體映射載入 export_block 的結果，回傳 (陣列, 座標軸)，不會把整個檔案讀進記憶體
+        with open(path + ".json", encoding="utf-8") as file:
+            axes = json.load(file)
+        axes["periods"] = [tuple(period) for period in axes["periods"]]
+        return np.load(path, mmap_mode="r"), axes
+
+    @staticmethod
+    def block_frame(block, axes, year, season):
+        # 取出某一期的 (公司, 項目) DataFrame，直接引用映射的陣列，不複製數據
+        import pandas as pd
+        index = axes["periods"].index((year, season))
+        return pd.DataFrame(block[:, index, :], index=pd.Index(axes["companies"], name="stock_code"), columns=axes["items"], copy=False)
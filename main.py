@@ -3,11 +3,42 @@ import json
 import pandas as pd
 
 from openai_client import OpenAIClient
-from fiancial_statement.analyzer import Analyzer
-from fiancial_statement.calculator import Calculator
+from fiancial_statement import metrics
+from fiancial_statement.pipeline import build_ttm, calculate_scores, latest_period
+from fiancial_statement.warehouse import Warehouse
+
+# 分析結果保留時間與最多保留的股票數
+RESULT_TTL = 6 * 60 * 60
+RESULT_MAX_ENTRIES = 256
+
+
+@st.cache_resource
+def configure_metrics():
+    # 依 FINANCIAL_STATEMENT_METRICS 啟用量測，整個程序只設定一次
+    return metrics.configure()
+
+
+@st.cache_resource
+def get_openai_client():
+    # 所有使用者共用同一個 OpenAIClient（以及其連線池）
+    return OpenAIClient()
+
+
+@st.cache_data(ttl=10 * 60, max_entries=RESULT_MAX_ENTRIES, show_spinner=False)
+def get_latest_period(stock_code):
+    return latest_period(stock_code)
+
+
+@st.cache_data(ttl=RESULT_TTL, max_entries=RESULT_MAX_ENTRIES, show_spinner=False)
+def analyze(stock_code, year, season):
+    # 以 (股票代號, 最新期別) 為鍵快取抓取、TTM 與分數計算的結果，新財報公布後自動失效
+    ttm, year, season = build_ttm(stock_code, warehouse=Warehouse.shared())
+    return ttm, year, season, calculate_scores(ttm, year, season)
+
 
 # Streamlit 應用程式標題
 st.set_page_config(page_title="AI 財務顧問", page_icon="📊")
+configure_metrics()
 st.title("🕵️‍♂️ 你的 AI 財務顧問")
 st.markdown("提供 Altman Z-Score、F-Score、M-Score 以及 AI 財務分析報告。")
 
@@ -17,31 +48,11 @@ if st.button("開始分析") and stock_code:
 
     with st.spinner(f"📊 正在分析股票代號: {stock_code}...", show_time=True):
 
-        ttm = {'stock_code': stock_code}
-        analyzer = Analyzer(stock_code)
-
-        analyzer.retrieve_trailing_twelve_months("BS")
-        analyzer.retrieve_trailing_twelve_months("CI")
-        analyzer.retrieve_trailing_twelve_months("CF")
-        year = analyzer.year
-        season = analyzer.season
-        ttm[year] = analyzer.calculate_ttm(year, season)
-
-        analyzer.retrieve_trailing_twelve_months("BS", year - 1, season)
-        analyzer.retrieve_trailing_twelve_months("CI", year - 1, season)
-        analyzer.retrieve_trailing_twelve_months("CF", year - 1, season)
-        ttm[year - 1] = analyzer.calculate_ttm(year - 1, season)
-
-        analyzer.retrieve_trailing_twelve_months("BS", year - 2, season)
-        analyzer.retrieve_trailing_twelve_months("CI", year - 2, season)
-        analyzer.retrieve_trailing_twelve_months("CF", year - 2, season)
-        ttm[year - 2] = analyzer.calculate_ttm(year - 2, season)
-    
-    # 計算財務指標
-    calculator = Calculator(ttm, year, season)
-    z_score_data = calculator.calculate_z_score()
-    f_score_data = calculator.calculate_f_score()
-    m_score_data = calculator.calculate_m_score()
+        # 同時抓取 BS/CI/CF 三年份的報表並整理成 TTM，再計算財務指標
+        ttm, year, season, scores = analyze(stock_code, *get_latest_period(stock_code))
+    z_score_data = scores['z_score']
+    f_score_data = scores['f_score']
+    m_score_data = scores['m_score']
 
         # 顯示財務指標圖表
     def render_custom_progress(value, thresholds, colors, labels):
@@ -91,8 +102,6 @@ if st.button("開始分析") and stock_code:
     
     # AI 分析報告
     st.subheader("🤖 AI 分析報告")
-    with st.spinner("🤖 AI 正在分析財務狀況..."):
-        data = {'z_score': z_score_data, 'f_score': f_score_data, 'm_score': m_score_data}
-        openai_client = OpenAIClient()
-        response = openai_client.get_response(json.dumps(data, ensure_ascii=False, indent=2), "分析這家公司")
-    st.write(response)
\ No newline at end of file
+    openai_client = get_openai_client()
+    # 逐段顯示回應，不必等待完整的報告
+    st.write_stream(openai_client.stream_response(json.dumps(scores, ensure_ascii=False, indent=2), "分析這家公司"))
\ No newline at end of file
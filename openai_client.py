@@ -1,33 +1,160 @@
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from fiancial_statement import metrics
+from fiancial_statement.cache import ResponseCache, default_cache_path
 
 class OpenAIClient:
-    def __init__(self):
+
+    MODEL = "meta-llama/llama-3.1-70b-instruct:free"
+    BASE_URL = "https://openrouter.ai/api/v1"
+    # 批次產生報告時同時進行的請求數
+    CONCURRENCY = 4
+
+    def __init__(self, base_url=None, model=None, cache=None):
         load_dotenv()
         api_key = os.getenv("API_KEY")
-        base_url = "https://openrouter.ai/api/v1"
-        # Initialize the client with API key and base URL
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        # 可用 OPENAI_BASE_URL 指向本機相容 OpenAI 的測試伺服器
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL", self.BASE_URL)
+        self.api_key = api_key
+        self.model = model or os.getenv("OPENAI_MODEL", self.MODEL)
+        self._client = None
+        self.async_client = None
+        # cache 為 None 時使用本機的回應快取，傳入 False 則不使用快取
+        self.cache = ResponseCache(default_cache_path("llm.sqlite3")) if cache is None else cache
 
-    def get_response(self, data, question):
+    @property
+    def client(self):
+        # 第一次呼叫 LLM 時才載入 openai 並建立 client，沒用到報告的流程不需負擔其載入時間
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._client
 
+    def build_messages(self, data, question):
         # Format the question as per the requirement
         question = f'請根據這些數據「{data}」回答「{question}」'
+        return [{"role": "user", "content": f"{question}\n"}]
+
+    def cache_key(self, messages):
+        # 以模型與完整的提示（包含分數 JSON）作為快取的鍵
+        return {"model": self.model, "messages": messages}
+
+    def cached_response(self, messages):
+        if not self.cache:
+            return None
+        cached = self.cache.get(self.model, self.cache_key(messages))
+        return cached["content"] if cached else None
+
+    def store_response(self, messages, content):
+        if self.cache and content:
+            self.cache.set(self.model, self.cache_key(messages), {"content": content})
+
+    def get_response(self, data, question):
+        messages = self.build_messages(data, question)
+        cached = self.cached_response(messages)
+        if cached is not None:
+            return cached
 
         try:
             # Make the API call to get the response
-            response = self.client.chat.completions.create(
-                model="meta-llama/llama-3.1-70b-instruct:free",
-                messages=[{"role": "user", "content": f"{question}\n"}],
-                stream=False
-            )
+            with metrics.span("llm.request", mode="blocking"):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    stream=False
+                )
 
             if response and response.choices:
                 # Return the content of the first choice
-                return response.choices[0].message.content
+                content = response.choices[0].message.content
+                self.store_response(messages, content)
+                return content
             else:
                 return "錯誤：未收到有效的回應或選項。"
         except Exception as e:
             # Return error if any occurs
-            return f"發生錯誤: {e}"
\ No newline at end of file
+            return f"發生錯誤: {e}"
+
+    def stream_response(self, data, question):
+        # 逐段產生回應文字，可直接交給 st.write_stream 顯示
+        messages = self.build_messages(data, question)
+        cached = self.cached_response(messages)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        finished = False
+        start = time.perf_counter()
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                stream=True
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                if chunk.choices[0].delta.content:
+                    if not chunks:
+                        metrics.observe("llm.first_token", time.perf_counter() - start)
+                    chunks.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+                if chunk.choices[0].finish_reason:
+                    finished = True
+        except Exception as e:
+            yield f"發生錯誤: {e}"
+            return
+        if not chunks:
+            yield "錯誤：未收到有效的回應或選項。"
+            return
+        metrics.observe("llm.request", time.perf_counter() - start, mode="stream")
+        # 連線中途斷開時串流會直接結束而不會拋出例外，沒有收到 finish_reason 的回應不寫入快取
+        if not finished:
+            yield "\n\n錯誤：回應中斷，內容可能不完整。"
+            return
+        self.store_response(messages, "".join(chunks))
+
+    def create_async_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+
+    async def get_response_async(self, data, question, semaphore=None, client=None):
+        if client is None:
+            # 非同步用戶端綁定在建立它的事件迴圈上，長時間運行的服務共用同一個
+            self.async_client = self.async_client or self.create_async_client()
+            client = self.async_client
+        messages = self.build_messages(data, question)
+        cached = self.cached_response(messages)
+        if cached is not None:
+            return cached
+
+        try:
+            async with semaphore or asyncio.Semaphore(1):
+                start = time.perf_counter()
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    stream=False
+                )
+                metrics.observe("llm.request", time.perf_counter() - start, mode="async")
+            if response and response.choices:
+                content = response.choices[0].message.content
+                self.store_response(messages, content)
+                return content
+            else:
+                return "錯誤：未收到有效的回應或選項。"
+        except Exception as e:
+            return f"發生錯誤: {e}"
+
+    async def get_responses_async(self, requests_, concurrency=None):
+        # requests_ 為 (data, question) 的列表，最多同時進行 concurrency 個請求，回傳順序與輸入相同
+        semaphore = asyncio.Semaphore(concurrency or self.CONCURRENCY)
+        async with self.create_async_client() as client:
+            return await asyncio.gather(*(self.get_response_async(data, question, semaphore, client) for data, question in requests_))
+
+    def get_responses(self, requests_, concurrency=None):
+        return asyncio.run(self.get_responses_async(requests_, concurrency))
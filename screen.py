@@ -0,0 +1,38 @@
+import argparse
+
+from fiancial_statement import metrics
+from fiancial_statement.screener import Screener
+from fiancial_statement.warehouse import Warehouse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批次計算整個市場的 Z-score、F-score、M-score")
+    parser.add_argument("source", help="股票代號清單檔（每行一個），或 TWSE、TPEx、ALL")
+    parser.add_argument("-o", "--output", default="screen_results.csv", help="輸出檔案（.csv 或 .parquet）")
+    parser.add_argument("-c", "--checkpoint", default="screen_checkpoint.jsonl", help="檢查點檔案，中斷後可從此續跑")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="同時分析的股票數量")
+    parser.add_argument("--skip-failed", action="store_true", help="續跑時不重試先前失敗的股票")
+    parser.add_argument("--warehouse", action="store_true", help="將解析後的財報保存到本機的財報資料庫")
+    parser.add_argument("--metrics", help="量測輸出：log、prometheus:/path/metrics.prom，預設讀取 FINANCIAL_STATEMENT_METRICS")
+    args = parser.parse_args()
+    sink = metrics.configure(args.metrics)
+
+    stock_codes = Screener.load_stock_codes(args.source)
+    screener = Screener(args.checkpoint, max_workers=args.workers, retry_failed=not args.skip_failed, warehouse=Warehouse.shared() if args.warehouse else None)
+    progress = {"done": 0}
+
+    def on_result(row):
+        progress["done"] += 1
+        status = "失敗 " + row["error"] if row["error"] else "完成"
+        print(f"[批次分析] {progress['done']} {row['stock_code']} {status}")
+
+    rows = screener.run(stock_codes, on_result)
+    Screener.write_results(rows, args.output)
+    failed = sum(1 for row in rows if row.get("error"))
+    print(f"[批次分析] 共 {len(rows)} 檔，失敗 {failed} 檔，結果已寫入 {args.output}")
+    if hasattr(sink, "flush"):
+        sink.flush()
+
+
+if __name__ == "__main__":
+    main()
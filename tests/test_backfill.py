@@ -0,0 +1,113 @@
+import json
+import datetime
+
+import numpy as np
+import pandas as pd
+import requests
+
+from benchmarks.fixtures import FixtureResponse, ReplayHttpClient, synthetic_statement
+from fiancial_statement.backfill import Backfill
+from fiancial_statement.fetcher import Fetcher
+from fiancial_statement.market_cap import SnapshotMarketCapProvider
+from fiancial_statement.shares import ShareCapitalSource
+from fiancial_statement.store import ItemVocabulary, StatementStore
+
+ROWS = 20
+
+
+class GapHttpClient(ReplayHttpClient):
+
+    # 早於 listed 的期別查無資料，failing 中的 (type, year, season) 拋出連線錯誤
+    def __init__(self, listed=(0, 0), failing=()):
+        super().__init__(rows=ROWS)
+        self.listed = listed
+        self.failing = set(failing)
+        self.types = {url: type for type, url in Fetcher.BASE_URLS.items()}
+
+    def post(self, url, data=None, **kwargs):
+        if url in self.types:
+            payload = json.loads(data)
+            if payload["dataType"] == 2:
+                period = (int(payload["year"]), int(payload["season"]))
+                if (self.types[url], *period) in self.failing:
+                    raise requests.ConnectionError("connection reset")
+                if period < self.listed:
+                    return FixtureResponse(json.dumps({"result": None}))
+        return super().post(url, data=data, **kwargs)
+
+
+def make_backfill(tmp_path, start_year=113, http=None, **kwargs):
+    http = http or GapHttpClient()
+    return Backfill(
+        start_year, cache=False, http=http,
+        share_source=ShareCapitalSource(str(tmp_path / "shares.sqlite3"), cache=False, http=http),
+        market_cap_provider=SnapshotMarketCapProvider(str(tmp_path / "market_cap")),
+        **kwargs
+    )
+
+
+def test_rolling_ttm():
+    store = StatementStore(ItemVocabulary())
+    store.set(112, 2, "資產總額", 10.0)
+    store.set(113, 2, "資產總額", 20.0)
+    store.set(112, 2, "營業收入合計", 50.0)
+    store.set(112, 4, "營業收入合計", 120.0)
+    store.set(113, 2, "營業收入合計", 70.0)
+
+    ttm = Backfill.rolling_ttm(store, {"資產總額"}, [(112, 4), (113, 2), (113, 1)], ("資產總額", "營業收入合計", "不存在的項目"))
+    np.testing.assert_array_equal(ttm, [
+        # Q4 的損益項目即為全年，資產負債表項目取當期
+        [np.nan, 120.0, np.nan],
+        # 當期累計 + 去年 Q4 - 去年同期累計
+        [20.0, 70.0 + 120.0 - 50.0, np.nan],
+        [np.nan, np.nan, np.nan]
+    ])
+
+
+def test_retrieve_keeps_point_in_time_values(tmp_path):
+    store, stock_items, last_period, missing = make_backfill(tmp_path).retrieve("2330")
+    assert last_period == (113, 2)
+    assert missing == []
+    assert "資產總額" in stock_items
+    # 較早期別以該期自己的報表為準，而不是之後報表中的比較數字
+    for year, season in ((112, 4), (112, 2), (111, 1)):
+        own = synthetic_statement("BS", year, season, ROWS)["reportList"][0][1]
+        assert store.get(year, season, "資產總額") == float(own.replace(",", ""))
+    later = synthetic_statement("BS", 113, 2, ROWS)["reportList"][0][5]
+    assert store.get(112, 2, "資產總額") != float(later.replace(",", ""))
+
+
+def test_periods_without_data_are_skipped(tmp_path):
+    backfill = make_backfill(tmp_path, http=GapHttpClient(listed=(111, 3)))
+    scores, errors = backfill.run(["2330"])
+    assert errors == {}
+    assert sorted(backfill.missing_reports["2330"]) == sorted(
+        (type, year, season) for type in Backfill.TYPES for year, season in ((111, 1), (111, 2))
+    )
+    assert scores[["year", "season"]].values.tolist() == [[113, 1], [113, 2]]
+
+
+def test_transport_error_fails_company(tmp_path):
+    backfill = make_backfill(tmp_path, http=GapHttpClient(failing=[("CI", 112, 3)]))
+    results = []
+    scores, errors = backfill.run(["2330"], lambda stock_code, rows, error: results.append((stock_code, rows)))
+    assert errors["2330"].startswith("ConnectionError")
+    assert results == [("2330", 0)]
+    assert scores.empty
+    assert backfill.missing_reports == {}
+
+
+def test_market_caps_by_filing_deadline(tmp_path):
+    backfill = make_backfill(tmp_path, start_year=112)
+    directory = backfill.market_cap_provider.directory
+    SnapshotMarketCapProvider.write_snapshot(directory, datetime.date(2023, 5, 10), {"2330": (100, 10.0)})
+    SnapshotMarketCapProvider.write_snapshot(directory, datetime.date(2023, 11, 20), {"2330": (100, 30.0)})
+    SnapshotMarketCapProvider.write_snapshot(directory, datetime.date(2024, 3, 1), {"2330": (100, 40.0), "2317": (10, 1.0)})
+    index = pd.MultiIndex.from_tuples(
+        [("2330", 111, 1), ("2330", 112, 1), ("2330", 112, 2), ("2330", 112, 3), ("2330", 112, 4), ("2317", 112, 1)],
+        names=["stock_code", "year", "season"]
+    )
+
+    # Q1 期限 2023-05-15 取 5/10 的快照；Q2、Q3 只有超過 MAX_SNAPSHOT_AGE 或晚於期限的快照；Q4 期限 2024-03-31 取 3/1 的快照
+    assert backfill.market_caps(index) == {1: {("2330", 112): 1000.0}, 4: {("2330", 112): 4000.0, ("2317", 112): 10.0}}
+    assert backfill.missing_market_caps == [(112, 2), (112, 3)]
@@ -0,0 +1,93 @@
+import time
+
+from fiancial_statement.cache import ResponseCache
+from fiancial_statement.fetcher import Fetcher
+
+URL = Fetcher.BASE_URLS["BS"]
+
+
+def payload(company, year="LASTEST", season="LASTEST"):
+    return {"companyId": company, "dataType": 1 if year == "LASTEST" else 2, "season": season, "year": year, "subsidiaryCompanyId": ""}
+
+
+def make_cache(tmp_path, latest_ttl=None):
+    return ResponseCache(str(tmp_path / "mops.sqlite3"), latest_ttl=latest_ttl)
+
+
+def test_round_trip_and_key_ignores_payload_order(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set(URL, payload("2330", 113, 2), {"year": "113"})
+    reordered = dict(reversed(list(payload("2330", 113, 2).items())))
+    assert cache.get(URL, reordered) == {"year": "113"}
+    assert cache.get(URL, payload("2330", 113, 1)) is None
+    assert cache.get(Fetcher.BASE_URLS["CI"], payload("2330", 113, 2)) is None
+
+
+def test_latest_entries_expire_after_ttl(tmp_path):
+    cache = make_cache(tmp_path, latest_ttl=0.05)
+    cache.set(URL, payload("2330"), {"year": "113"}, latest=True)
+    assert cache.get(URL, payload("2330")) == {"year": "113"}
+    time.sleep(0.1)
+    assert cache.get(URL, payload("2330")) is None
+
+
+def test_historical_entries_never_expire(tmp_path):
+    cache = make_cache(tmp_path, latest_ttl=0)
+    cache.set(URL, payload("2330", 110, 4), {"year": "110"})
+    time.sleep(0.01)
+    assert cache.get(URL, payload("2330", 110, 4)) == {"year": "110"}
+
+
+def test_persists_across_instances(tmp_path):
+    make_cache(tmp_path).set(URL, payload("2330", 110, 4), {"year": "110"})
+    assert make_cache(tmp_path).get(URL, payload("2330", 110, 4)) == {"year": "110"}
+
+
+def test_invalidate_by_company_and_latest_only(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set(URL, payload("2330"), {"year": "113"}, latest=True)
+    cache.set(URL, payload("2330", 110, 4), {"year": "110"})
+    cache.set(URL, payload("2317"), {"year": "113"}, latest=True)
+
+    assert cache.invalidate("2330", latest_only=True) == 1
+    assert cache.get(URL, payload("2330")) is None
+    assert cache.get(URL, payload("2330", 110, 4)) == {"year": "110"}
+    assert cache.get(URL, payload("2317")) == {"year": "113"}
+
+    assert cache.invalidate("2330") == 1
+    assert cache.get(URL, payload("2330", 110, 4)) is None
+    assert cache.clear() == 1
+    assert cache.get(URL, payload("2317")) is None
+
+
+class StubResponse:
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class StubHttp:
+
+    def __init__(self, body):
+        self.body = body
+        self.requests = 0
+
+    def post(self, url, **kwargs):
+        self.requests += 1
+        return StubResponse(self.body)
+
+
+def test_fetcher_does_not_cache_incomplete_results(tmp_path):
+    http = StubHttp({"result": {"message": "查詢無資料"}})
+    fetcher = Fetcher("2330", make_cache(tmp_path), http)
+    for _ in range(2):
+        fetcher.request_financial_statement(URL, 2, 110, 4)
+    assert http.requests == 2
+
+    http.body = {"result": {"year": "110", "season": "4", "titles": [], "reportList": []}}
+    for _ in range(2):
+        fetcher.request_financial_statement(URL, 2, 110, 4)
+    assert http.requests == 3
@@ -0,0 +1,95 @@
+import time
+import socket
+import threading
+
+import pytest
+import requests
+
+from fiancial_statement.http_client import HttpClient, TokenBucket
+
+
+def make_client(**kwargs):
+    # 本機測試不受預設的速率限制影響，退避時間縮短
+    kwargs.setdefault("host_rates", {"127.0.0.1": (1000, 1000)})
+    kwargs.setdefault("backoff", 0.01)
+    kwargs.setdefault("timeout", (1, 5))
+    return HttpClient(**kwargs)
+
+
+class FakeResponse:
+
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def test_retries_server_error_until_success(stub_server):
+    stub_server.responses = [(503, {}), (502, {})]
+    response = make_client().get(stub_server.url)
+    assert response.status_code == 200
+    assert stub_server.requests == 3
+
+
+def test_does_not_retry_client_error(stub_server):
+    stub_server.responses = [(404, {})]
+    response = make_client().get(stub_server.url)
+    assert response.status_code == 404
+    assert stub_server.requests == 1
+
+
+def test_raises_after_max_retries(stub_server):
+    stub_server.responses = [(503, {})] * 3
+    with pytest.raises(requests.HTTPError):
+        make_client(max_retries=2).post(stub_server.url, data="{}")
+    assert stub_server.requests == 3
+
+
+def test_retries_rate_limit_with_retry_after(stub_server):
+    stub_server.responses = [(429, {"Retry-After": "0"})]
+    response = make_client(backoff=10).get(stub_server.url)
+    assert response.status_code == 200
+    assert stub_server.requests == 2
+
+
+def test_retries_connection_error_then_raises():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    with pytest.raises(requests.ConnectionError):
+        make_client(max_retries=1).get(f"http://127.0.0.1:{port}/")
+
+
+def test_backoff_delay_honours_retry_after_and_cap():
+    client = HttpClient(backoff=1, max_backoff=5)
+    assert client.backoff_delay(0, FakeResponse({"Retry-After": "3"})) == 3
+    assert client.backoff_delay(0, FakeResponse({"Retry-After": "60"})) == 5
+    for attempt in range(10):
+        assert 0 <= client.backoff_delay(attempt) <= min(5, 2 ** attempt)
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    # 第一個 token 立即可用，其餘 5 個每個約需 20ms
+    assert time.monotonic() - start >= 0.08
+
+
+def test_host_rate_limit_applies_to_requests(stub_server):
+    client = make_client(host_rates={"127.0.0.1": (20, 1)})
+    start = time.monotonic()
+    for _ in range(4):
+        client.get(stub_server.url)
+    assert time.monotonic() - start >= 0.12
+
+
+def test_per_host_semaphore_limits_concurrency(stub_server):
+    stub_server.delay = 0.1
+    client = make_client(host_concurrency={"127.0.0.1": 2})
+    threads = [threading.Thread(target=client.get, args=(stub_server.url,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stub_server.requests == 6
+    assert stub_server.max_active == 2
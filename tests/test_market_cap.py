@@ -0,0 +1,75 @@
+import datetime
+
+import pytest
+import requests
+
+from fiancial_statement.market_cap import SnapshotMarketCapProvider
+
+
+class StubResponse:
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def json(self):
+        return self.rows
+
+
+class StubHttp:
+
+    # 前 failures 次請求拋出連線錯誤，之後回傳一檔股票的收盤價與發行股數
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.requests = 0
+
+    def get(self, url, **kwargs):
+        self.requests += 1
+        if self.failures:
+            self.failures -= 1
+            raise requests.ConnectionError("connection refused")
+        if "STOCK_DAY" in url or "quotes" in url:
+            return StubResponse([{"Code": "2330", "ClosingPrice": "1,000.00"}])
+        return StubResponse([{"公司代號": "2330", "已發行普通股數或TDR原股發行股數": "25,930,380,458"}])
+
+
+def test_loads_latest_snapshot_not_after_date(tmp_path):
+    directory = str(tmp_path)
+    SnapshotMarketCapProvider.write_snapshot(directory, datetime.date(2024, 5, 1), {"2330": (100, 10.0)})
+    SnapshotMarketCapProvider.write_snapshot(directory, datetime.date(2024, 6, 3), {"2330": (100, 20.0)})
+    http = StubHttp()
+
+    provider = SnapshotMarketCapProvider(directory, date=datetime.date(2024, 5, 31), auto_refresh=True, http=http)
+    assert provider.get("2330") == 1000.0
+    assert provider.snapshot_date == datetime.date(2024, 5, 1)
+    assert provider.get(1101) is None
+    assert provider.load(datetime.date(2024, 6, 30)) == datetime.date(2024, 6, 3)
+    assert provider.market_caps == {"2330": 2000.0}
+    assert provider.load(datetime.date(2024, 4, 30)) is None
+    # 指定過去日期時不會下載今天的快照
+    assert http.requests == 0
+
+
+def test_failed_download_is_retried(tmp_path):
+    http = StubHttp(failures=1)
+    provider = SnapshotMarketCapProvider(str(tmp_path), auto_refresh=True, http=http)
+    with pytest.raises(requests.ConnectionError):
+        provider.get("2330")
+    # 等待重試期間不會重新下載
+    assert provider.get("2330") is None
+    assert http.requests == 1
+
+    provider.retry_at = 0.0
+    assert provider.get("2330") == 25930380458 * 1000.0
+    assert provider.snapshot_date == datetime.date.today()
+    requests_made = http.requests
+    assert provider.get("2330") == 25930380458 * 1000.0
+    assert http.requests == requests_made
+
+
+def test_failed_download_keeps_older_snapshot(tmp_path):
+    directory = str(tmp_path)
+    SnapshotMarketCapProvider.write_snapshot(directory, datetime.date.today() - datetime.timedelta(days=1), {"2330": (100, 10.0)})
+    provider = SnapshotMarketCapProvider(directory, auto_refresh=True, http=StubHttp(failures=1))
+    assert provider.get("2330") == 1000.0
+    provider.retry_at = 0.0
+    assert provider.get("2330") == 25930380458 * 1000.0
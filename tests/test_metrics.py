@@ -0,0 +1,108 @@
+import os
+import re
+import json
+import threading
+
+import pytest
+
+from benchmarks.fixtures import synthetic_statement
+from fiancial_statement import metrics
+from fiancial_statement.cache import ResponseCache
+from fiancial_statement.fetcher import Fetcher
+from fiancial_statement.http_client import HttpClient
+
+PROMETHEUS_LINE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? -?\d+(\.\d+)?(e-?\d+)?$')
+
+
+class BrokenSink:
+
+    def record_span(self, *args):
+        raise RuntimeError("sink is down")
+
+    def increment(self, *args):
+        raise RuntimeError("sink is down")
+
+
+@pytest.fixture
+def sink():
+    # 測試期間使用 InMemorySink，結束後恢復為不量測
+    yield metrics.set_sink(metrics.InMemorySink())
+    metrics.set_sink(None)
+
+
+@pytest.fixture
+def fetcher(stub_server, tmp_path, monkeypatch):
+    # 資產負債表的網址指向本機的測試伺服器
+    monkeypatch.setitem(Fetcher.BASE_URLS, "BS", stub_server.url)
+    stub_server.body = json.dumps({"result": synthetic_statement("BS", 113, 2, rows=5)}, ensure_ascii=False).encode("utf-8")
+    http = HttpClient(host_rates={"127.0.0.1": (1000, 1000)}, backoff=0.01, timeout=(1, 5))
+    return Fetcher("2330", ResponseCache(str(tmp_path / "mops.sqlite3")), http)
+
+
+def test_fetch_reports_spans_and_counters(sink, fetcher, stub_server):
+    stub_server.responses = [(503, {})]
+    for _ in range(2):
+        assert fetcher.fetch_data("BS", 113, 2)[:2] == (113, 2)
+    assert stub_server.requests == 2
+
+    summary = sink.summary()
+    assert summary["fetch"][0] == 2
+    assert summary["http.request"][0] == 2
+    assert [span[2] for span in sink.spans if span[0] == "fetch"] == [{"type": "BS"}] * 2
+    assert sink.counter("http.retries", host="127.0.0.1") == 1
+    # 503 的回應也帶有相同的內容
+    assert sink.counter("http.bytes", host="127.0.0.1") == 2 * len(stub_server.body)
+    assert sink.counter("cache.misses", cache="mops") == 1
+    assert sink.counter("cache.hits", cache="mops") == 1
+
+
+def test_broken_sink_does_not_break_fetch(fetcher, stub_server, caplog):
+    metrics.set_sink(BrokenSink())
+    try:
+        assert fetcher.fetch_data("BS", 113, 2)[:2] == (113, 2)
+    finally:
+        metrics.set_sink(None)
+    assert stub_server.requests == 1
+    assert "metrics sink 寫入失敗" in caplog.text
+
+
+def test_concurrent_prometheus_flushes_leave_valid_file(tmp_path):
+    path = str(tmp_path / "metrics.prom")
+    sink = metrics.PrometheusTextFileSink(path, interval=0)
+    threads, rounds = 8, 100
+    done = threading.Event()
+    invalid = []
+
+    def work(index):
+        for _ in range(rounds):
+            sink.increment("requests", 1, {"worker": str(index % 2)})
+            sink.record_span("fetch", 0.001, {}, False)
+
+    def read():
+        # 寫檔期間隨時讀取，內容都必須完整
+        while not done.is_set():
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as file:
+                    content = file.read()
+                if not content.endswith("\n") or not all(PROMETHEUS_LINE.match(line) for line in content.splitlines()):
+                    invalid.append(content)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    workers = [threading.Thread(target=work, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    done.set()
+    reader.join()
+    sink.flush()
+
+    assert invalid == []
+    with open(path, encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    assert all(PROMETHEUS_LINE.match(line) for line in lines)
+    values = dict(line.rsplit(" ", 1) for line in lines)
+    assert float(values['financial_statement_requests_total{worker="0"}']) == threads * rounds / 2
+    assert float(values["financial_statement_fetch_seconds_count"]) == threads * rounds
+    assert os.listdir(tmp_path) == ["metrics.prom"]
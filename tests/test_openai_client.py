@@ -0,0 +1,60 @@
+import pytest
+
+from benchmarks.llm_stub import REPORT, start_stub
+from fiancial_statement.cache import ResponseCache
+from openai_client import OpenAIClient
+
+
+@pytest.fixture
+def llm(monkeypatch, tmp_path):
+    # 啟動本機的 LLM 測試伺服器，回傳 (server, 建立 OpenAIClient 的函式)
+    monkeypatch.setenv("API_KEY", "test")
+    servers = []
+
+    def start(cache=True, **kwargs):
+        server, base_url = start_stub(**kwargs)
+        servers.append(server)
+        cache = ResponseCache(str(tmp_path / "llm.sqlite3")) if cache else False
+        return server, OpenAIClient(base_url=base_url, model="stub", cache=cache)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_stream_yields_chunks_in_order_and_is_cached(llm):
+    server, client = llm()
+    assert list(client.stream_response("{}", "分析這家公司")) == REPORT
+    assert server.requests == 1
+
+    assert "".join(client.stream_response("{}", "分析這家公司")) == "".join(REPORT)
+    assert client.get_response("{}", "分析這家公司") == "".join(REPORT)
+    assert server.requests == 1
+
+
+def test_interrupted_stream_is_not_cached(llm):
+    server, client = llm(fail_after=2)
+    chunks = list(client.stream_response("{}", "分析這家公司"))
+    assert chunks[:2] == REPORT[:2]
+    assert "回應中斷" in chunks[-1]
+    list(client.stream_response("{}", "分析這家公司"))
+    assert server.requests == 2
+
+
+def test_empty_stream_is_not_cached(llm):
+    server, client = llm(fail_after=0)
+    assert list(client.stream_response("{}", "分析這家公司")) == ["錯誤：未收到有效的回應或選項。"]
+    list(client.stream_response("{}", "分析這家公司"))
+    assert server.requests == 2
+
+
+def test_get_responses_keeps_order_and_limits_concurrency(llm):
+    server, client = llm(cache=False, delay=0.05, echo=True)
+    questions = [f"問題 {index}" for index in range(8)]
+    responses = client.get_responses([("{}", question) for question in questions], concurrency=3)
+    assert len(responses) == len(questions)
+    for question, response in zip(questions, responses):
+        assert f"「{question}」" in response
+    assert server.requests == len(questions)
+    assert 1 < server.max_active <= 3
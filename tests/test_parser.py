@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from benchmarks.fixtures import synthetic_share_page
+from fiancial_statement.analyzer import Analyzer
+from fiancial_statement.parser import TOTAL_SHARES_PATTERN, Parser
+from fiancial_statement.store import ItemVocabulary, StatementStore
+
+
+def test_parse_amounts():
+    datas = [["資產總額", "1,000", "50.00", ""], ["負債總額", " -20 ", "1.00", "3"]]
+    np.testing.assert_array_equal(Parser.parse_amounts(datas, [1, 3]), [[1000.0, np.nan], [-20.0, 3.0]])
+
+
+def test_parse_amounts_without_columns_or_rows():
+    assert Parser.parse_amounts([["資產總額"], ["負債總額"]], []).shape == (2, 0)
+    assert Parser.parse_amounts([], [1, 3]).shape == (0, 2)
+
+
+def test_parse_report_without_dates():
+    analyzer = Analyzer("2330", cache=False, http=object())
+    analyzer.result = StatementStore(ItemVocabulary())
+    analyzer.parse_financial_statement("BS", [], [["資產總額"]], 2)
+    assert analyzer.result.periods == {}
+
+
+def test_total_shares_regex_does_not_cross_rows():
+    # 第三格不是純數字時，正規表示式不會跨到下一列擷取其他數字，改由 lxml 解析
+    html = (
+        '<html><body><form><input type="hidden" name="Q2V" value="113"></form><table>'
+        '<tr><td>實際發行總股數</td><td>股</td><td>25,930,380,458 股</td></tr>'
+        '<tr><td>庫藏股數</td><td>股</td><td>1,234</td></tr>'
+        '</table></body></html>'
+    )
+    assert TOTAL_SHARES_PATTERN.search(html) is None
+    assert Parser.extract_total_shares_and_year(html) == (25930380458, "113")
+
+
+def test_total_shares_regex_fast_path():
+    html = synthetic_share_page("2330", 113)
+    assert TOTAL_SHARES_PATTERN.search(html) is not None
+    total_shares, year = Parser.extract_total_shares_and_year(html)
+    assert year == "113" and f"{total_shares:,}" in html
+
+
+def test_total_shares_missing():
+    with pytest.raises(ValueError):
+        Parser.extract_total_shares_and_year('<html><body><p>查詢無資料</p></body></html>')
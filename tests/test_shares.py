@@ -0,0 +1,51 @@
+from benchmarks.fixtures import synthetic_share_page
+from fiancial_statement.shares import ShareCapitalSource
+
+
+class StubResponse:
+
+    def __init__(self, text):
+        self.text = text
+
+
+class StubHttp:
+
+    # 回傳股權分散表頁面，最新年度為 113 年
+    def __init__(self):
+        self.requests = []
+
+    def post(self, url, data=None, **kwargs):
+        self.requests.append(data["year"])
+        year = 113 if data["year"] == "LASTEST" else int(data["year"])
+        return StubResponse(synthetic_share_page(data["co_id"], year))
+
+
+def make_source(tmp_path, http, latest_ttl=None):
+    return ShareCapitalSource(str(tmp_path / "shares.sqlite3"), latest_ttl=latest_ttl, cache=False, http=http)
+
+
+def test_repeat_lookup_is_served_from_sqlite(tmp_path):
+    http = StubHttp()
+    source = make_source(tmp_path, http)
+    # synthetic_share_page 每兩年發行一次新股：112、113 年股數相同，113、114 年不同
+    assert source.is_no_new_shares("2330", 113) is True
+    assert http.requests == [113, 112]
+    assert source.is_no_new_shares("2330", 113) is True
+    assert http.requests == [113, 112]
+
+    # 另一個實例讀取同一個檔案，也不需要重新查詢
+    assert make_source(tmp_path, http).is_no_new_shares("2330", 113) is True
+    assert http.requests == [113, 112]
+
+
+def test_latest_year_is_refreshed_after_ttl(tmp_path):
+    http = StubHttp()
+    source = make_source(tmp_path, http)
+    assert source.is_no_new_shares("2330") is True
+    assert http.requests == ["LASTEST", 112]
+    source.is_no_new_shares("2330")
+    assert http.requests == ["LASTEST", 112]
+
+    expired = make_source(tmp_path, http, latest_ttl=-1)
+    assert expired.issued_shares("2330") == source.issued_shares("2330", 113)
+    assert http.requests == ["LASTEST", 112, "LASTEST"]
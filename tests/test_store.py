@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+
+from benchmarks.fixtures import ReplayHttpClient
+from fiancial_statement.analyzer import Analyzer
+from fiancial_statement.store import ItemVocabulary, StatementStore
+from fiancial_statement.warehouse import Warehouse
+
+
+def make_analyzer(rows=50):
+    analyzer = Analyzer("2330", cache=False, http=ReplayHttpClient(rows=rows))
+    analyzer.result = StatementStore(ItemVocabulary())
+    return analyzer
+
+
+def test_calculate_ttm_while_vocabulary_grows():
+    # 其他執行緒同時登記新項目時，同一次 calculate_ttm 取出的各期向量長度必須一致
+    analyzer = make_analyzer()
+    analyzer.retrieve_all()
+    vocabulary = analyzer.result.vocabulary
+    expected = analyzer.calculate_ttm(113, 2)
+    done = threading.Event()
+
+    def grow():
+        for index in range(20000):
+            if done.is_set():
+                break
+            vocabulary.id(f"新項目 {index}")
+
+    thread = threading.Thread(target=grow)
+    thread.start()
+    try:
+        for _ in range(500):
+            assert analyzer.calculate_ttm(113, 2) == expected
+    finally:
+        done.set()
+        thread.join()
+
+
+def test_vector_uses_given_size():
+    store = StatementStore(ItemVocabulary())
+    store.set(113, 2, "資產總額", 100.0)
+    store.vocabulary.id("負債總額")
+    assert store.vector(113, 2, size=1).tolist() == [100.0]
+    assert store.vector(112, 2, 0, 1).tolist() == [0.0]
+    np.testing.assert_array_equal(store.vector(113, 2), [100.0, np.nan])
+
+
+def test_retrieve_and_load_compact_the_store(tmp_path):
+    warehouse = Warehouse(str(tmp_path / "warehouse.sqlite3"))
+    analyzer = make_analyzer()
+    analyzer.warehouse = warehouse
+    analyzer.retrieve_all()
+    store = analyzer.result
+    assert store.values.shape == (len(store.periods), len(store.vocabulary))
+
+    loaded = warehouse.load("2330", StatementStore(store.vocabulary))
+    assert loaded.values.shape[0] == len(loaded.periods) == len(store.periods)
+    assert loaded.to_dict() == store.to_dict()